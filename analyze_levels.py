@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import multiprocessing
+import os
+from random import Random
+import statistics
+
+from engine import GameEngine
+from level_store import DEFAULT_LEVELS
+from level_store import get_level_store
+
+
+class FollowBallPolicy:
+    '''Scripted player that follows the ball with the platform. It
+    aims at a random point of the platform, reacts only when the ball
+    falls and can\'t move the platform faster than a given speed, so it
+    misses sometimes.
+
+    Attributes
+    ----------
+        random : object
+            Random generator of the player
+        max_speed : float
+            Maximal distance the platform moves in one tick
+        max_error : float
+            Maximal distance between the ball and the aimed point
+    '''
+
+    def __init__(self, random, max_speed=9, max_error=40):
+        self.random = random
+        self.max_speed = max_speed
+        self.max_error = max_error
+        self.aim()
+
+    def aim(self):
+        '''Picks a new point of the platform to catch the ball with'''
+
+        self.error = self.random.uniform(-self.max_error, self.max_error)
+
+    def move(self, engine):
+        '''Moves the platform towards the ball.
+
+        Parameters
+        ----------
+            engine : object
+                GameEngine object
+        '''
+
+        # Waits until the ball comes back
+        if engine.ball.y_direction < 0:
+            return
+
+        x = engine.platform.x
+        target = engine.ball.x + self.error
+        shift = max(-self.max_speed, min(self.max_speed, target - x))
+
+        engine.move_platform(x + shift)
+
+
+def play_level(store_path, level, seed, max_ticks, lives, player_speed):
+    '''Plays one headless game of a level.
+
+    Parameters
+    ----------
+        store_path : str
+            Path to a levels file
+        level : int
+            Number of a level
+        seed : int
+            Seed of the game
+        max_ticks : int
+            Number of ticks after which the game is stopped
+        lives : int
+            Number of lives
+        player_speed : float
+            Maximal distance the player moves the platform in one tick
+
+    Returns
+    -------
+        result : dict
+            Number of the level, whether it was cleared, ticks played,
+            lives lost and blocks left
+    '''
+
+    random = Random(seed)
+    engine = GameEngine(get_level_store(store_path), seed=seed)
+    engine.state.lives = lives
+    engine.state.level = level
+    engine.load_level(level)
+    policy = FollowBallPolicy(random, max_speed=player_speed)
+
+    # Shoots the ball from a random place
+    engine.move_platform(random.uniform(0, engine.width))
+    engine.launch()
+
+    cleared = False
+    while engine.ticks < max_ticks:
+        policy.move(engine)
+        result = engine.step()
+
+        if result in ('FINISHED LEVEL', 'FINISHED GAME'):
+            cleared = True
+            break
+        elif result == 'GAME OVER':
+            break
+        elif result == 'LOST LIFE':
+            engine.move_platform(random.uniform(0, engine.width))
+            engine.launch()
+
+        if result != 'OK':
+            policy.aim()
+
+    return {
+        'level': level,
+        'cleared': cleared,
+        'ticks': engine.ticks,
+        'lives_lost': lives - engine.state.lives,
+        'blocks_left': 0 if cleared else len(engine.blocks)
+    }
+
+
+def play_level_task(task):
+    '''Unpacks arguments of play_level for a process pool'''
+
+    return play_level(*task)
+
+
+def summarize(results):
+    '''Summarizes games of every level.
+
+    Parameters
+    ----------
+        results : list
+            Results of play_level
+
+    Returns
+    -------
+        summary : dict
+            Maps level numbers to statistics of their games
+    '''
+
+    levels = {}
+    for result in results:
+        levels.setdefault(result['level'], []).append(result)
+
+    summary = {}
+    for level, games in sorted(levels.items()):
+        clears = [game['ticks'] for game in games if game['cleared']]
+        timeouts = [game for game in games if not game['cleared']]
+
+        summary[level] = {
+            'games': len(games),
+            'cleared': len(clears) / len(games),
+            'ticks_to_clear': statistics.median(clears) if clears else None,
+            'lives_lost': statistics.mean(
+                game['lives_lost'] for game in games
+            ),
+            'blocks_left': statistics.mean(
+                game['blocks_left'] for game in timeouts
+            ) if timeouts else 0
+        }
+
+    return summary
+
+
+def print_summary(summary):
+    '''Prints statistics of every level as a table'''
+
+    print(
+        f'{"level":>6} {"games":>6} {"cleared":>8} {"ticks":>9} '
+        f'{"lives lost":>11} {"blocks left":>12}'
+    )
+    for level, stats in summary.items():
+        ticks = stats['ticks_to_clear']
+        ticks = '-' if ticks is None else f'{ticks:.0f}'
+        print(
+            f'{level:>6} {stats["games"]:>6} {stats["cleared"]:>8.0%} '
+            f'{ticks:>9} {stats["lives_lost"]:>11.2f} '
+            f'{stats["blocks_left"]:>12.1f}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Estimates difficulty of levels by playing them '
+        'with a scripted player on all cores'
+    )
+    parser.add_argument(
+        'levels',
+        nargs='?',
+        default=DEFAULT_LEVELS,
+        help='path to a levels JSON file or to a compiled pack'
+    )
+    parser.add_argument(
+        '--games', type=int, default=20, help='number of games per level'
+    )
+    parser.add_argument(
+        '--max-ticks',
+        type=int,
+        default=100000,
+        help='number of ticks after which a game is stopped'
+    )
+    parser.add_argument(
+        '--lives', type=int, default=3, help='number of lives in a game'
+    )
+    parser.add_argument(
+        '--player-speed',
+        type=float,
+        default=9,
+        help='maximal distance the player moves the platform in one tick'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='seed of the first game'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help='number of worker processes'
+    )
+    parser.add_argument(
+        '--json', help='path to a file to write the statistics to'
+    )
+    args = parser.parse_args()
+
+    store = get_level_store(args.levels)
+    tasks = [
+        (
+            args.levels, level, args.seed + game,
+            args.max_ticks, args.lives, args.player_speed
+        )
+        for level in store.numbers()
+        for game in range(args.games)
+    ]
+
+    # Games are independent, so they are spread over all workers
+    chunksize = max(len(tasks) // (args.workers * 4), 1)
+    with multiprocessing.Pool(args.workers) as pool:
+        results = list(pool.imap_unordered(
+            play_level_task, tasks, chunksize=chunksize
+        ))
+
+    summary = summarize(results)
+    print_summary(summary)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
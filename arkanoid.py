@@ -1,25 +1,34 @@
 #!/usr/bin/env python3
 
-import sys
-sys.path.append(
-    '/usr/intel/pkgs/python3/3.7.4/modules/r1/lib/python3.7/site-packages/'
-)
+import time
+
+# Startup is measured from here, see --startup-profile
+STARTED = time.perf_counter()
 
-import json
+import argparse
 import math
 import os
-from PIL import Image, ImageTk
-from random import randint
-import time
+import random
+import sys
 from tkinter import Canvas
 from tkinter import CENTER
-from tkinter import StringVar
+from tkinter import NW
 from tkinter import Tk
+from tkinter import Toplevel
 from tkinter import ttk
 
-from game_objects import Ball
-from game_objects import Block
-from game_objects import Platform
+from clock import FixedTimestepClock
+from engine import GameEngine
+from level_store import DEFAULT_LEVELS
+from level_store import get_level_store
+from particles import ParticleSystem
+from power_ups import COLORS
+from power_ups import SHOT_COLOR
+from scheduler import Scheduler
+from sprites import get_sprite_cache
+
+# Time the game\'s modules were imported at
+IMPORTED = time.perf_counter()
 
 
 class ArkanoidGame:
@@ -30,12 +39,84 @@ class ArkanoidGame:
     ----------
         master : object
             tkinter root window object
+        tick_rate : int
+            Number of simulation ticks per second
+        frame_rate : int
+            Number of drawn frames per second
+        profiler : object
+            FrameProfiler object that records frames, or None
+        overlay : bool
+            Whether to show profiler\'s statistics on the screen
+        seed : int
+            Seed of the game, random if omitted
+        recorder : object
+            replay.Recording object that records player\'s inputs, or
+            None
+        balls : int
+            Number of balls the ball splits into when it is shot
+        levels : object
+            LevelStore or ProceduralLevels object, levels/levels.json if
+            omitted
+        startup : object
+            profiler.StartupTimer object that records startup stages, or
+            None
+        scores : object
+            score_store.ScoreStore object that keeps results of games,
+            or None
+        pack : str
+            Name of the levels results are kept for
+        power_ups : bool
+            Whether hit blocks drop power-ups
+        particle_budget : float
+            Seconds a frame may spend on particle effects, 0 turns them
+            off
+        scheduler : object
+            scheduler.Scheduler object shared by the games of a process,
+            or None to create one
     '''
 
-    def __init__(self, master):
+    def __init__(self, master, tick_rate=120, frame_rate=60, profiler=None,
+            overlay=False, seed=None, recorder=None, balls=1, levels=None,
+            startup=None, scores=None, pack='levels.json', power_ups=True,
+            particle_budget=0.002, scheduler=None):
         self.master = master
         master.title('Arkanoid')
 
+        # All timed work of the game goes through the scheduler
+        if scheduler is None:
+            scheduler = Scheduler(master)
+        self.scheduler = scheduler
+        self.timers = scheduler.session(f'game {len(scheduler.sessions) + 1}')
+
+        # Game's speed
+        self.tick_rate = tick_rate
+        self.frame_rate = frame_rate
+
+        # Frames instrumentation
+        self.profiler = profiler
+        self.overlay = overlay
+
+        # Game's randomness and inputs recording
+        if seed is None:
+            seed = random.randrange(2**32)
+        self.seed = seed
+        self.recorder = recorder
+
+        # Multi-ball stress mode
+        self.balls = balls
+        self.levels = levels
+        self.startup = startup
+        self.power_ups = power_ups
+
+        # Effects get thinner when they don't fit into the budget
+        self.particles = None
+        if particle_budget:
+            self.particles = ParticleSystem(budget=particle_budget, seed=seed)
+
+        # Results of games
+        self.scores = scores
+        self.pack = pack
+
         # Size of a window
         self.width = 1200
         self.height = 820
@@ -51,22 +132,55 @@ class ArkanoidGame:
         # Creates a welcome screen
         self.create_welcome_screen()
 
+        if startup is not None:
+            startup.mark('welcome screen')
+            self.timers.after_idle(startup.mark, 'first frame')
+
+        # Decodes pictures and levels while the player looks at the screen
+        self._warm_job = self.timers.after(
+            1, self.warm_up, self.warm_up_steps()
+        )
+
+        master.protocol('WM_DELETE_WINDOW', self.close)
+
     def initiate_common_attributes(self):
         '''Initiates common game\'s attributes'''
 
         self._job = None
+        self._label_job = None
+        self.label = None
         game_dir = os.path.realpath(__file__)
         self.game_dir = os.path.dirname(game_dir)
-        self.platform_width = 90
-        self.platform_height = 20
-        self.ball_width = 15
-        self.ball_height = 15
-        self.ball_shot = False
-        self.rows = 12
-        self.columns = 18
-        self.blocks_variations = 7
-        self.block_width = 58
-        self.block_height = 37
+        self.engine = None
+        self.drawn_blocks = None
+        self.platform_image = None
+        self.ball_images = []
+        self.item_images = []
+        self.shot_images = []
+        self.shown_kinds = []
+        self.shown_items = 0
+        self.shown_shots = 0
+        self.shown_platform_width = None
+        self.particle_images = []
+        self.shown_colors = []
+        self.shown_particles = 0
+        self._particles_job = None
+        self.pending_coords = {}
+        self.pending_deletes = []
+        self._flush_job = None
+        self.pointer_x = None
+        self.pointer_time = None
+        self._draw_job = None
+        self.preloader = None
+        self.preloaded = None
+        self.session = None
+        self.level_start_ticks = 0
+        self.frame_ticks = 0
+        self.overlay_text = None
+        self.overlay_interval = max(self.frame_rate // 2, 1)
+        self.sprites = get_sprite_cache(self.game_dir + '/pics')
+        self.clock = FixedTimestepClock(self.tick_rate)
+        self.frame_delay = max(1000 // self.frame_rate, 1)
         self.labels_coordinates = {
             'level': (521, 5),
             'gameover': (478, 5),
@@ -134,8 +248,8 @@ class ArkanoidGame:
 
         colors = self.color_map
 
-        # Spatial UI that has information about level, score, and amount
-        # of lives
+        # Spatial UI that has information about level, score, amount of
+        # lives and combo
         canvas = Canvas(
             self.master,
             width=self.width-20,
@@ -176,27 +290,100 @@ class ArkanoidGame:
         button.place(x=492, y=443, width=200, height=50)
         self.start_button = button
     
+    def warm_up_steps(self):
+        '''Yields after every loaded asset, so the welcome screen stays
+        responsive while the caches are filled'''
+
+        if self.levels is None:
+            get_level_store(DEFAULT_LEVELS)
+            yield
+
+        for name in ('platform', 'ball'):
+            self.sprites.photo(name)
+            yield
+
+        for variant in range(1, GameEngine.blocks_variations + 1):
+            self.sprites.block(variant)
+            yield
+
+    def warm_up(self, steps):
+        '''Runs the next warm up step when the event loop is idle.
+
+        Parameters
+        ----------
+            steps : generator
+                Generator returned by warm_up_steps
+        '''
+
+        self._warm_job = None
+        if next(steps, 'done') != 'done':
+            self._warm_job = self.timers.after(1, self.warm_up, steps)
+            return
+
+        if self.startup is not None:
+            self.startup.mark('assets warm')
+            self.startup.report()
+            self.master.destroy()
+
     def prepare_for_game(self):
         '''Prepares to start the game'''
 
         canvas = self.playground_canvas
+
+        # Everything that isn't warm yet is loaded on demand
+        if self._warm_job:
+            self.timers.cancel(self._warm_job)
+            self._warm_job = None
         
         # Clears playground by removing the widgets
         canvas.delete(self.title)
         self.start_button.destroy()
 
         # Initializes the game
+        levels = self.levels
+        if levels is None:
+            levels = get_level_store(DEFAULT_LEVELS)
+        self.engine = GameEngine(
+            levels,
+            width=float(canvas.cget('width')),
+            height=float(canvas.cget('height')),
+            seed=self.seed,
+            tick_rate=self.tick_rate,
+            power_ups=self.power_ups
+        )
+        self.engine.recorder = self.recorder
+        self.engine.load_level()
+
+        if self.scores is not None:
+            self.session = self.scores.start_session(self.pack, self.seed)
         self.create_info_bar()
 
-        # Creates a platform object and image
+        # Creates a platform image
         self.create_platform()
 
-        # Creates a ball object and image
+        # Creates a ball image
         self.create_ball()
 
+        # Creates images of power-ups and laser shots
+        if self.power_ups:
+            self.create_power_up_images()
+
+        # Creates images of particles
+        if self.particles is not None:
+            self.create_particle_images()
+
         # Creates level
         self.create_level()
 
+        # Shows frames statistics
+        if self.profiler and self.overlay:
+            self.overlay_text = canvas.create_text(
+                10, 10,
+                anchor=NW,
+                fill=self.color_map['title'],
+                font=('Calibri', 10)
+            )
+
         # Hides mouse cursor
         self.master.config(cursor='none')
 
@@ -206,9 +393,6 @@ class ArkanoidGame:
         info_canvas = self.info_bar
 
         # Level label
-        self.level = StringVar()
-        self.level.set('1')
-
         ttk.Label(
             info_canvas,
             text='Level',
@@ -217,7 +401,6 @@ class ArkanoidGame:
 
         label = ttk.Label(
             info_canvas,
-            textvariable=self.level,
             style='Info.TLabel',
             anchor='center',
             width=10
@@ -230,9 +413,6 @@ class ArkanoidGame:
         self.level_label = label
 
         # Score label
-        self.score = StringVar()
-        self.score.set('0')
-
         ttk.Label(
             info_canvas,
             text='Score',
@@ -241,7 +421,6 @@ class ArkanoidGame:
 
         label = ttk.Label(
             info_canvas,
-            textvariable=self.score,
             style='Info.TLabel',
             anchor='center',
             width=10
@@ -254,9 +433,6 @@ class ArkanoidGame:
         self.score_label = label
 
         # Lives label
-        self.lives = StringVar()
-        self.lives.set('3')
-
         ttk.Label(
             info_canvas,
             text='Lives',
@@ -265,7 +441,6 @@ class ArkanoidGame:
 
         label = ttk.Label(
             info_canvas,
-            textvariable=self.lives,
             style='Info.TLabel',
             anchor='center',
             width=10
@@ -276,151 +451,397 @@ class ArkanoidGame:
             label.place(x=734, y=34)
 
         self.lives_label = label
-    
-    def create_platform(self):
-        '''Creates a platform'''
 
-        canvas = self.playground_canvas
+        # Combo label
+        ttk.Label(
+            info_canvas,
+            text='Combo',
+            style='Info.TLabel'
+        ).place(x=972, y=5)
 
-        image = ImageTk.PhotoImage(
-            Image.open(self.game_dir + '/pics/platform.png')
+        label = ttk.Label(
+            info_canvas,
+            style='Info.TLabel',
+            anchor='center',
+            width=10
         )
+        if sys.platform == 'linux':
+            label.place(x=949, y=34)
+        else:
+            label.place(x=939, y=34)
 
-        # x,y of platform's center
-        x = 571
-        y = 680
+        self.combo_label = label
 
-        self.platform_image = canvas.create_image(
-            x, y,
-            anchor=CENTER,
-            image=image
+        # Values shown by the labels, in GameState.fields order
+        self.info_labels = (
+            self.score_label, self.lives_label,
+            self.level_label, self.combo_label
         )
-        self.platform = Platform(image, x, y)
+        self.shown_state = (None,) * len(self.info_labels)
+        self.refresh_info_bar()
     
-    def create_ball(self):
-        '''Creates in game ball'''
+    def create_platform(self):
+        '''Creates a platform image. The image is created once and
+        moved afterwards.'''
 
         canvas = self.playground_canvas
-        image = ImageTk.PhotoImage(
-            Image.open(self.game_dir + '/pics/ball.png')
+        platform = self.engine.platform
+
+        self.platform_image = canvas.create_image(
+            platform.x, platform.y,
+            anchor=CENTER,
+            image=self.sprites.photo('platform')
         )
 
-        # x,y of ball's center
-        x = self.platform.x
-        y = self.platform.y - self.platform_height/2 - self.ball_height/2
+    def create_ball(self):
+        '''Creates in game ball image. The image is created once and
+        moved afterwards.'''
+
+        canvas = self.playground_canvas
+        ball = self.engine.ball
 
-        self.ball_image = canvas.create_image(
-            x, y,
+        self.ball_images = [canvas.create_image(
+            ball.x, ball.y,
             anchor=CENTER,
-            image=image
-        )
-        self.ball = Ball(image, x, y)
+            image=self.sprites.photo('ball')
+        )]
 
         canvas.bind('<Button-1>', self.move_ball)
 
+    def create_power_up_images(self):
+        '''Creates an image for every slot of engine\'s power-ups and
+        laser shots pools. They are reused for all items and only moved
+        off the canvas when a slot is empty.'''
+
+        canvas = self.playground_canvas
+        engine = self.engine
+
+        self.item_images = [
+            canvas.create_rectangle(
+                -10, -10, -10, -10, fill=COLORS[1], outline='',
+                tags='power_up'
+            )
+            for _ in range(engine.items.capacity)
+        ]
+        self.shown_kinds = [1] * engine.items.capacity
+
+        self.shot_images = [
+            canvas.create_rectangle(
+                -10, -10, -10, -10, fill=SHOT_COLOR, outline='',
+                tags='power_up'
+            )
+            for _ in range(engine.shots.capacity)
+        ]
+
+    def create_particle_images(self):
+        '''Creates an image for every particle slot. They are reused
+        for all bursts.'''
+
+        canvas = self.playground_canvas
+        capacity = self.particles.capacity
+
+        self.particle_images = [
+            canvas.create_rectangle(
+                -10, -10, -10, -10, outline='', tags='particle'
+            )
+            for _ in range(capacity)
+        ]
+        self.shown_colors = [None] * capacity
+
+    def sync_ball_images(self):
+        '''Creates or deletes ball images so there is one image for
+        every ball in play. The i-th image always draws the i-th ball.'''
+
+        canvas = self.playground_canvas
+        balls = self.engine.balls
+        images = self.ball_images
+
+        while len(images) < len(balls):
+            ball = balls[len(images)]
+            images.append(canvas.create_image(
+                ball.x, ball.y,
+                anchor=CENTER,
+                image=self.sprites.photo('ball')
+            ))
+
+        while len(balls) < len(images):
+            self.delete_item(images.pop())
+
     def create_level(self, level=1):
-        '''Creates blocks of the next level.
-        
+        '''Creates blocks images of the next level. The engine loads
+        the level itself.
+
         Parameters
         ----------
             level : int
                 Number of a level
         '''
 
-        canvas = self.playground_canvas
-
-        # Gets next level
-        level_str = 'level' + str(level)
-        with open(self.game_dir+'/levels/levels.json', 'r') as f:
-            levels = json.load(f)
-        level_blocks = levels[level_str]
-
-        self.block_images = []
-        self.blocks = []
-        
-        for i in range(self.rows):
-            for j in range(self.columns):
-                if level_blocks[i][j]:
-                    block_indexber = randint(1, self.blocks_variations)
-                    image = ImageTk.PhotoImage(
-                        Image.open(self.game_dir + '/pics/block_' + str(block_indexber)\
-                            + '.png')
-                    )
-
-                    # x,y of block's center
-                    x = 100 + j*self.block_width
-                    y = 100 + i*self.block_height
-
-                    block_image = canvas.create_image(
-                        x, y,
-                        anchor=CENTER,
-                        image=image
-                    )
-                    self.block_images.append(block_image)
-                    self.blocks.append(Block(image, x, y))
-        
-        self.block_images.reverse()
-        self.blocks.reverse()
+        self.wait_preloaded()
+        self.draw_blocks()
 
         # Show label presenting current level
         x, y = self.labels_coordinates['level']
         self.show_label('LEVEL '+str(level), x=x, y=y)
 
-    def move_platform(self, event=None):
-        '''Redraws platform image on a new x coordinate'''
+        # The next level is prepared while this one is played
+        self.preload_level(level + 1)
 
-        canvas = self.playground_canvas
-        new_x = canvas.canvasx(event.x)
+    def block_scale(self, width, height):
+        '''Returns scale of blocks\' pictures, or None if blocks have
+        the biggest size.
 
-        # Stops platform at the left edge
-        if new_x < self.platform_width/2:
-            new_x = self.platform_width/2
-        
-        # Stops platform at the right edge
-        canvas_width = float(canvas.cget('width'))
-        if canvas_width-self.platform_width/2 < new_x:
-            new_x = canvas_width - self.platform_width/2
-
-        # Redraws the platform 
-        canvas.delete(self.platform_image)
-        self.platform.x = new_x
-        self.platform_image = canvas.create_image(
-            self.platform.x,
-            self.platform.y,
-            anchor=CENTER,
-            image=self.platform.image
+        Parameters
+        ----------
+            width : float
+                Width of a block
+            height : float
+                Height of a block
+        '''
+
+        engine = self.engine
+        if width == engine.max_block_width\
+                and height == engine.max_block_height:
+            return None
+
+        # Blocks of big levels are shrunk to fit the board
+        return (
+            width / engine.max_block_width,
+            height / engine.max_block_height
         )
 
-        if not self.ball_shot:
-            # Redraws the ball to be in the center of the platform
-            canvas.unbind('<Button-1>')
-            canvas.delete(self.ball_image)
-            self.create_ball()
+    def preload_level(self, level):
+        '''Decodes a level and its blocks\' pictures on a worker thread.
+
+        Parameters
+        ----------
+            level : int
+                Number of a level
+        '''
+
+        engine = self.engine
+        if level not in engine.levels:
+            return
+
+        # Levels of the classic size are quick to decode, the worker is
+        # needed only if their pictures aren\'t cached yet
+        scale = self.block_scale(
+            *engine.block_size(*engine.levels.size(level))
+        )
+        variants = range(1, engine.blocks_variations + 1)
+        if scale is None and all(
+                self.sprites.cached('block_' + str(variant))
+                for variant in variants):
+            return
+
+        if self.preloader is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self.preloader = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix='preload'
+            )
+
+        self.preloaded = self.preloader.submit(
+            self.prepare_level, level, scale
+        )
+
+    def prepare_level(self, level, scale):
+        '''Warms up caches of a level. Runs on the worker thread, so it
+        doesn\'t touch tkinter.
+
+        Parameters
+        ----------
+            level : int
+                Number of a level
+            scale : tuple
+                Scale of blocks\' pictures, or None
+        '''
+
+        engine = self.engine
+        engine.levels.level(level)
+
+        for variant in range(1, engine.blocks_variations + 1):
+            self.sprites.block_image(variant, scale)
+
+    def wait_preloaded(self):
+        '''Waits until the worker has prepared the level and reports
+        its failure. The level is drawn anyway, its caches are filled
+        on this thread then.'''
+
+        preloaded = self.preloaded
+        if preloaded is None:
+            return
+        self.preloaded = None
+
+        error = preloaded.exception()
+        if error is not None:
+            self.master.report_callback_exception(
+                type(error), error, error.__traceback__
+            )
+
+    def draw_blocks(self):
+        '''Creates images of engine\'s blocks. They are created a chunk
+        per frame while the level\'s label is shown, so big levels don\'t
+        freeze the window.'''
+
+        if self._draw_job:
+            self.timers.cancel(self._draw_job)
+            self._draw_job = None
+
+        # Keeps the drawn field, hit blocks are erased from it even after
+        # the engine loads the next level
+        blocks = self.engine.blocks
+        self.drawn_blocks = blocks
+
+        scale = self.block_scale(blocks.cell_width, blocks.cell_height)
+
+        # The whole level is drawn within a second
+        pending = list(blocks)
+        pending.reverse()
+        chunk = max(math.ceil(len(pending) * self.frame_delay / 1000), 32)
+
+        self.draw_blocks_chunk(blocks, pending, chunk, scale)
+
+    def draw_blocks_chunk(self, blocks, pending, chunk, scale):
+        '''Creates images of the next chunk of blocks.
+
+        Parameters
+        ----------
+            blocks : object
+                BlockField object
+            pending : list
+                Indices of blocks without images, the last one is drawn
+                first
+            chunk : int
+                Number of images created at once
+            scale : tuple
+                Scale of blocks\' pictures, or None
+        '''
+
+        self._draw_job = None
+        canvas = self.playground_canvas
+
+        for _ in range(min(chunk, len(pending))):
+            block = pending.pop()
+
+            # The ball could have hit the block already
+            if blocks.is_alive(block):
+                blocks.items[block] = canvas.create_image(
+                    blocks.xs[block], blocks.ys[block],
+                    anchor=CENTER,
+                    image=self.sprites.block(blocks.variants[block], scale)
+                )
+
+        # Falling power-ups and particles stay in front of the blocks
+        if self.item_images:
+            canvas.tag_raise('power_up')
+        if self.particle_images:
+            canvas.tag_raise('particle')
+
+        if pending:
+            self._draw_job = self.timers.after(
+                self.frame_delay,
+                self.draw_blocks_chunk, blocks, pending, chunk, scale
+            )
+
+    def move_platform(self, event=None):
+        '''Remembers the latest pointer x coordinate. Motion events only
+        overwrite it, the platform is moved once per frame by
+        apply_pointer.'''
+
+        self.pointer_x = self.playground_canvas.canvasx(event.x)
+
+        # Latency is measured from the oldest event that isn't drawn yet
+        if self.pointer_time is None:
+            self.pointer_time = time.perf_counter()
+
+        # Ball's loop applies the pointer itself
+        if not self._job:
+            self.request_flush()
 
         return 'break'
 
+    def apply_pointer(self):
+        '''Moves the platform to the latest pointer x coordinate, the ball
+        follows it until it is shot'''
+
+        if self.pointer_x is None:
+            return
+
+        engine = self.engine
+        engine.move_platform(self.pointer_x)
+        self.pointer_x = None
+
+        # Redraws the platform
+        platform = engine.platform
+        self.move_item(self.platform_image, platform.x, platform.y)
+
+        if not engine.ball_shot:
+            # Redraws the ball to be in the center of the platform
+            self.move_item(self.ball_images[0], engine.ball.x, engine.ball.y)
+
     def move_ball(self, event=None):
         '''Moves a piece down'''
 
-        self.ball_shot = True
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.begin_frame()
 
+        self.play_frame(event)
+        self.refresh_info_bar()
+
+        # Applies all canvas changes of the frame at once
+        self.flush_canvas()
+
+        if profiler is not None:
+            profiler.mark('flush')
+            profiler.end_frame(self.frame_ticks)
+
+            # Refreshes statistics twice a second
+            if self.overlay_text and profiler.count % self.overlay_interval == 0:
+                self.update_overlay()
+
+    def play_frame(self, event=None):
+        '''Simulates ticks of a frame and redraws changed objects'''
+
+        engine = self.engine
         canvas = self.playground_canvas
-        canvas.unbind('<Button-1>')
-        
-        self.ball.move()
-        result = self.check_collision()
 
-        if result == 'LOST LIFE':
-            self.master.after_cancel(self._job)
+        # Motion since the last frame is applied before the ticks
+        self.apply_pointer()
+
+        if event:
+            # The ball is shot, simulation time starts now
+            engine.launch()
+            if self.balls > 1:
+                engine.add_balls(self.balls - 1)
+            self.clock.reset()
+            canvas.unbind('<Button-1>')
+
+        # Runs as many ticks as real time passed since the last frame
+        self.frame_ticks = self.clock.advance()
+        result = engine.step(self.frame_ticks)
+
+        if self.profiler is not None:
+            self.profiler.mark('simulation')
+
+        # Removes images of hit blocks, some may not be drawn yet
+        items = self.drawn_blocks.items
+        for block in engine.removed_blocks:
+            if items[block]:
+                self.delete_item(items[block])
+
+        if self.particles is not None and engine.removed_blocks:
+            self.burst_blocks(self.drawn_blocks, engine.removed_blocks)
+
+        if result in ('LOST LIFE', 'GAME OVER'):
+            self.timers.cancel(self._job)
             self._job = None
-            
-            # Reduces one life
-            lives = int(self.lives.get())
-            lives -= 1
-            self.lives.set(str(lives))
 
-            if lives == 0:
+            self.animate_particles()
+
+            if result == 'GAME OVER':
                 print('GAME OVER')
+                self.save_session()
 
                 x, y = self.labels_coordinates['gameover']
                 self.show_label(text='GAME OVER', x=x, y=y)
@@ -431,21 +852,22 @@ class ArkanoidGame:
                 self.redraw_objects()
 
             return
-        elif result == 'WIN':
+        elif result in ('FINISHED LEVEL', 'FINISHED GAME'):
             print('FINISHED LEVEL')
+            self.save_level_clear(result)
+
+            # Celebrates until the next level is started
+            if self.particles is not None:
+                self.burst_board()
+            self.animate_particles()
 
             # Disables ball's movement
-            self.master.after_cancel(self._job)
+            self.timers.cancel(self._job)
             self._job = None
 
-            # Increases level
-            level = int(self.level.get())
-            level += 1
-            if level < 3:
-                # Updates level
-                self.level.set(str(level))
-            else:
+            if result == 'FINISHED GAME':
                 print('FINISHED GAME')
+                self.save_session()
 
                 x, y = self.labels_coordinates['win']
                 self.show_label(text='YOU WIN', x=x, y=y)
@@ -454,253 +876,636 @@ class ArkanoidGame:
 
             # Creates next level
             self.redraw_objects()
-            self.create_level(level=level)
-            
+            self.create_level(level=engine.state.level)
+
             return
 
         # Redraws the ball
         self.redraw_ball()
+        self.redraw_power_ups()
 
-        if sys.platform == 'linux':
-            self._job = self.master.after(1, self.move_ball)
-        else:
-            self._job = self.master.after(2, self.move_ball)
+        # Particles are animated by the frames while the ball flies
+        if self._particles_job:
+            self.timers.cancel(self._particles_job)
+            self._particles_job = None
+        self.redraw_particles(self.frame_ticks / self.tick_rate)
 
-    def check_collision(self):
-        '''Checks ball\'s collision.
-        
-        Returns
-        -------
+        if self.profiler is not None:
+            self.profiler.mark('render')
+
+        self._job = self.timers.after(self.frame_delay, self.move_ball)
+
+    def save_level_clear(self, result):
+        '''Queues clear time of the finished level.
+
+        Parameters
+        ----------
             result : str
-                Whether the ball fell or everything is ok
+                "FINISHED LEVEL" or "FINISHED GAME"
         '''
 
-        # Checks ball collision with canvas boundaries
-        result = self.check_boundary_collision()
-        if result == 'LOST LIFE':
-            return result
-        
-        # Checks ball collision with the platform
-        self.check_platform_collision()
+        engine = self.engine
+        ticks = engine.ticks - self.level_start_ticks
+        self.level_start_ticks = engine.ticks
+        if self.session is None:
+            return
 
-        # Checks ball collision with the block
-        result = self.check_block_collision()
-        if result == 'HIT':
-            # Calculates the score
-            score = int(self.score.get())
-            score += 100
-            self.score.set(str(score))
+        # The engine is already on the next level unless the game is won
+        level = engine.state.level
+        if result == 'FINISHED LEVEL':
+            level -= 1
 
-            # Checks whether there are any blocks left
-            if not self.blocks:
-                return 'WIN'
+        self.session.level_cleared(level, ticks, self.tick_rate)
 
-        return 'OK'
+    def save_session(self):
+        '''Queues the result of the game and its frame statistics'''
 
-    def check_boundary_collision(self):
-        '''Checks ball\'s collision with canvas boundaries.
-        
-        Returns
-        -------
-            result : str
-                Whether the ball fell or everything is ok
-        '''
+        session = self.session
+        if session is None or session.finished or self.engine is None:
+            return
+
+        if self.profiler is not None:
+            summary = self.profiler.summary()
+            session.record('fps', summary['fps'])
+            for phase in (*self.profiler.phases, 'input'):
+                session.record(phase + ' p99', summary[phase]['p99'])
+
+        session.finish(self.engine.state, self.engine.ticks)
+
+    def refresh_info_bar(self):
+        '''Shows changed numbers of the game state, once per frame'''
+
+        state = self.engine.state.snapshot()
+        if state == self.shown_state:
+            return
+
+        for i, value in enumerate(state):
+            if value != self.shown_state[i]:
+                self.info_labels[i].configure(text=str(value))
 
+        self.shown_state = state
+
+    def redraw_objects(self):
+        '''Redraws the platform and the ball at the beginning'''
+
+        engine = self.engine
+
+        self.move_item(
+            self.platform_image, engine.platform.x, engine.platform.y
+        )
+        self.sync_ball_images()
+        self.move_item(self.ball_images[0], engine.ball.x, engine.ball.y)
+        self.redraw_power_ups()
+
+        self.playground_canvas.bind('<Button-1>', self.move_ball)
+
+    def redraw_ball(self):
+        '''Redraws the balls only'''
+
+        self.sync_ball_images()
+
+        # Draws the balls between the last two ticks
+        alpha = self.clock.alpha
+        for ball, image in zip(self.engine.balls, self.ball_images):
+            x, y = ball.interpolate(alpha)
+            self.move_item(image, x, y)
+
+    def redraw_power_ups(self):
+        '''Redraws power-ups, laser shots and the platform\'s width. At
+        most one image per pool slot is touched, however many blocks are
+        destroyed at once.'''
+
+        if not self.power_ups:
+            return
+
+        engine = self.engine
         canvas = self.playground_canvas
-        ball_x = self.ball.x
-        ball_y = self.ball.y
 
-        # Ball reached left edge of the canvas
-        if ball_x < self.ball_width/2:
-            self.ball.x_direction = 1
-            self.ball.x = self.ball_width/2
-        
-        # Ball reached right edge of the canvas
-        canvas_width = float(canvas.cget('width'))
-        if canvas_width-self.ball_width/2 < ball_x:
-            self.ball.x_direction = -1
-            self.ball.x = canvas_width - self.ball_width/2
-
-        # Ball reached upper edge of the canvas
-        if ball_y < self.ball_height/2:
-            self.ball.y_direction = 1
-            self.ball.y = self.ball_height/2
-        
-        # Ball reached bottom edge of the canvas
-        canvas_height = float(canvas.cget('height'))
-        if canvas_height-self.ball_height/2 < ball_y:
-            return 'LOST LIFE'
+        # Grown platform gets a stretched picture
+        if engine.platform_width != self.shown_platform_width:
+            self.shown_platform_width = engine.platform_width
+            size = None
+            if engine.platform_width != engine.normal_platform_width:
+                image = self.sprites.image('platform')
+                size = (
+                    round(image.width * engine.platform_width
+                        / engine.normal_platform_width),
+                    image.height
+                )
+            canvas.itemconfigure(
+                self.platform_image, image=self.sprites.photo('platform', size)
+            )
 
-        return 'OK'
-    
-    def check_platform_collision(self):
-        '''Checks ball\'s collision with the platform'''
-
-        ball_x = self.ball.x
-        ball_y = self.ball.y
-
-        # Ball's edges
-        ball_bottom = ball_y + self.ball_height/2
-
-        # Platform's edges
-        platform_left = self.platform.x - self.platform_width/2
-        platform_top = self.platform.y - self.platform_height/2
-        platform_right = self.platform.x + self.platform_width/2
-        platform_bottom = self.platform.y + self.platform_height/2
-
-        # Hits platform's top
-        if platform_left <= ball_x\
-                and platform_top <= ball_bottom\
-                and ball_x <= platform_right\
-                and ball_bottom <= platform_bottom:
-            self.ball.y_direction = -1
-            self.ball.y = platform_top - self.ball_height/2
-    
-    def check_block_collision(self):
-        '''Checks ball\'s collision with the block.
-        
-        Returns
-        -------
-            result : str
-                Whether the ball hit the block
+        items = engine.items
+        kinds = self.shown_kinds
+        for index in range(items.count):
+            image = self.item_images[index]
+            kind = items.kinds[index]
+            if kinds[index] != kind:
+                kinds[index] = kind
+                canvas.itemconfigure(image, fill=COLORS[kind])
+
+            self.move_box(
+                image, items.xs[index], items.ys[index],
+                engine.item_width, engine.item_height
+            )
+        self.hide_boxes(self.item_images, items.count, self.shown_items)
+        self.shown_items = items.count
+
+        shots = engine.shots
+        for index in range(shots.count):
+            self.move_box(
+                self.shot_images[index], shots.xs[index], shots.ys[index],
+                engine.shot_width, engine.shot_height
+            )
+        self.hide_boxes(self.shot_images, shots.count, self.shown_shots)
+        self.shown_shots = shots.count
+
+    def burst_blocks(self, blocks, removed):
+        '''Emits particles of blocks\' colors from hit blocks.
+
+        Parameters
+        ----------
+            blocks : object
+                BlockField object the blocks were removed from
+            removed : list
+                Indices of the removed blocks
         '''
 
-        for block_index, block in enumerate(self.blocks):
-            ball_x = self.ball.x
-            ball_y = self.ball.y
-
-            # Block's edges
-            block_left = block.x - self.block_width/2
-            block_bottom = block.y + self.block_height/2
-            block_right = block.x + self.block_width/2
-            block_top = block.y - self.block_height/2
-
-            # Ball's edges
-            ball_left = ball_x - self.ball_width/2
-            ball_bottom = ball_y + self.ball_height/2
-            ball_right = ball_x + self.ball_width/2
-            ball_top = ball_y - self.ball_height/2
-            
-            # Hits block's left
-            if block_top<=ball_y and ball_y<=block_bottom\
-                    and block_left<=ball_right\
-                    and ball_right<=block_right:
-                self.delete_block(block_index)
-                self.ball.x_direction = -1
-                return 'HIT'
-            
-            # Hits block's bottom
-            if block_left<=ball_x and ball_x<=block_right\
-                    and block_top<=ball_top\
-                    and ball_top<=block_bottom:
-                self.delete_block(block_index)
-                self.ball.y_direction = 1
-                return 'HIT'
-
-            # Hits block's right
-            if block_top<=ball_y and ball_y<=block_bottom\
-                    and block_left<=ball_left\
-                    and ball_left<=block_right:
-                self.delete_block(block_index)
-                self.ball.x_direction = 1
-                return 'HIT'
-
-            # Hits block's top
-            if block_left<=ball_x and ball_x<=block_right\
-                    and block_top<=ball_bottom\
-                    and ball_bottom<=block_bottom:
-                self.delete_block(block_index)
-                self.ball.y_direction = -1
-                return 'HIT'
-
-        return 'OK'
+        for block in removed:
+            self.particles.emit(
+                blocks.xs[block], blocks.ys[block], 12,
+                self.sprites.average_color(
+                    'block_' + str(blocks.variants[block])
+                )
+            )
+
+    def burst_board(self):
+        '''Emits fireworks all over the board when a level is cleared'''
 
-    def redraw_objects(self):
-        '''Redraws the platform and the ball'''
+        engine = self.engine
+        particles = self.particles
+        left, top = engine.board_start
+        width, height = engine.board_size
+        colors = list(COLORS.values())
+
+        for index in range(12):
+            particles.emit(
+                particles.random.uniform(left, left + width),
+                particles.random.uniform(top, top + height),
+                32, colors[index % len(colors)], speed=350, lifetime=1.2
+            )
+
+    def redraw_particles(self, seconds):
+        '''Moves particles and their images. Images are moved right
+        away rather than on the flush, so the budget covers tkinter\'s
+        work too. Particles that don\'t fit into the budget are dropped.
+
+        Parameters
+        ----------
+            seconds : float
+                Time passed since the last redraw
+        '''
+
+        particles = self.particles
+        if particles is None:
+            return
+        if not particles.count and not self.shown_particles:
+            return
+
+        start = particles.timer()
+        particles.update(seconds)
 
         canvas = self.playground_canvas
+        images = self.particle_images
+        colors = self.shown_colors
+        half_size = particles.size/2
+        xs, ys = particles.xs, particles.ys
+
+        for index in range(particles.count):
+            # Checks the clock once in a while, it isn\'t free either
+            if index % 32 == 31 and particles.over_budget(start):
+                particles.truncate(index)
+                break
+
+            image = images[index]
+            color = particles.colors[index]
+            if colors[index] != color:
+                colors[index] = color
+                canvas.itemconfigure(image, fill=color)
+
+            x = xs[index]
+            y = ys[index]
+            canvas.coords(
+                image, x - half_size, y - half_size,
+                x + half_size, y + half_size
+            )
 
-        self.ball_shot = False
+        for index in range(particles.count, self.shown_particles):
+            canvas.coords(images[index], -10, -10, -10, -10)
+        self.shown_particles = particles.count
 
-        canvas.delete(self.platform_image)
-        canvas.delete(self.ball_image)
+        particles.adapt(particles.timer() - start)
 
-        self.create_platform()
-        self.create_ball()
-    
-    def redraw_ball(self):
-        '''Redraws the ball only'''
+    def animate_particles(self):
+        '''Keeps particles moving while the ball doesn\'t fly, e.g.
+        after a level is cleared'''
+
+        self._particles_job = None
+        if self.particles is None:
+            return
+
+        self.redraw_particles(self.frame_delay / 1000)
+
+        if self.shown_particles:
+            self._particles_job = self.timers.after(
+                self.frame_delay, self.animate_particles
+            )
+
+    def update_overlay(self):
+        '''Shows frames per second, tick times and number of canvas
+        items'''
 
         canvas = self.playground_canvas
+        summary = self.profiler.summary()
+        simulation = summary['simulation']
+
+        canvas.itemconfigure(
+            self.overlay_text,
+            text=f'FPS {summary["fps"]:.0f}  '
+                f'tick p50 {simulation["p50"]:.2f} ms  '
+                f'p99 {simulation["p99"]:.2f} ms  '
+                f'input p99 {summary["input"]["p99"]:.1f} ms  '
+                f'items {len(canvas.find_all())}'
+                + self.particles_overlay()
+        )
 
-        canvas.delete(self.ball_image)
-        self.ball_image = canvas.create_image(
-            self.ball.x,
-            self.ball.y,
-            anchor=CENTER,
-            image=self.ball.image
+    def particles_overlay(self):
+        '''Returns number, limit and cost of particles for the overlay'''
+
+        particles = self.particles
+        if particles is None:
+            return ''
+
+        return (
+            f'  particles {particles.count}/{particles.limit} '
+            f'{particles.last_cost * 1e3:.2f} of '
+            f'{particles.budget * 1e3:.1f} ms'
         )
-    
-    def delete_block(self, block_index):
-        '''Deletes block from the game.
-        
+
+    def move_item(self, item, x, y):
+        '''Moves canvas item on the next flush.
+
+        Parameters
+        ----------
+            item : int
+                Id of a canvas item
+            x : float
+                New x coordinate of the item
+            y : float
+                New y coordinate of the item
+        '''
+
+        self.pending_coords[item] = (x, y)
+
+    def move_box(self, item, x, y, width, height):
+        '''Moves rectangle canvas item on the next flush.
+
         Parameters
         ----------
-            block_index : int
-                Index of a block
+            item : int
+                Id of a canvas item
+            x : float
+                X coordinate of the rectangle\'s center
+            y : float
+                Y coordinate of the rectangle\'s center
+            width : float
+                Width of the rectangle
+            height : float
+                Height of the rectangle
         '''
 
+        self.pending_coords[item] = (
+            x - width/2, y - height/2, x + width/2, y + height/2
+        )
+
+    def hide_boxes(self, items, count, shown):
+        '''Moves rectangles of emptied pool slots off the canvas.
+
+        Parameters
+        ----------
+            items : list
+                Ids of pooled canvas items
+            count : int
+                Number of slots in use
+            shown : int
+                Number of slots that were in use in the previous frame
+        '''
+
+        for index in range(count, shown):
+            self.pending_coords[items[index]] = (-10, -10, -10, -10)
+
+    def delete_item(self, item):
+        '''Deletes canvas item on the next flush.
+
+        Parameters
+        ----------
+            item : int
+                Id of a canvas item
+        '''
+
+        self.pending_coords.pop(item, None)
+        self.pending_deletes.append(item)
+
+    def request_flush(self):
+        '''Flushes the canvas once the event loop is idle'''
+
+        if not self._flush_job:
+            self._flush_job = self.timers.after_idle(self.flush_canvas)
+
+    def flush_canvas(self):
+        '''Applies all pending canvas changes'''
+
         canvas = self.playground_canvas
 
-        del self.blocks[block_index]
-        canvas.delete(self.block_images[block_index])
-        del self.block_images[block_index]
-    
-    def show_label(self, text='', x=0, y=0, widget=None, time=2):
-        '''Shows a label for 2 seconds.
-        
-        Parameters:
+        if self._flush_job:
+            self.timers.cancel(self._flush_job)
+            self._flush_job = None
+
+        self.apply_pointer()
+
+        for item, coords in self.pending_coords.items():
+            canvas.coords(item, *coords)
+        self.pending_coords = {}
+
+        if self.pending_deletes:
+            canvas.delete(*self.pending_deletes)
+            self.pending_deletes = []
+
+        # The platform is drawn at the pointer
+        if self.pointer_time is not None:
+            if self.profiler is not None:
+                self.profiler.record_latency(
+                    time.perf_counter() - self.pointer_time
+                )
+            self.pointer_time = None
+
+    def close(self):
+        '''Saves the game, stops its timers and closes its window'''
+
+        self.save_session()
+        self.timers.close()
+        if self.preloader is not None:
+            self.preloader.shutdown(wait=False)
+        self.master.destroy()
+
+    def show_label(self, text='', x=0, y=0, time=2):
+        '''Shows a label for 2 seconds. A new label replaces the shown
+        one. The label has its own timer, so it never cancels the ball\'s
+        loop.
+
+        Parameters
+        ----------
             text : str
                 Text of the label
             x : int
                 X coordinate of the label
             y : int
                 Y coordinate of the label
-            widget : object
-                ttk label object
             time : int
-                Seconds left to display the label
+                Seconds to display the label
         '''
 
+        if self.label is not None:
+            self.timers.cancel(self._label_job)
+            self.label.destroy()
+
         # Unbinds platform motion
         self.playground_canvas.unbind('<Motion>')
 
-        if not widget:
-            widget = ttk.Label(
-                self.playground_canvas,
-                text=text,
-                style='Level.TLabel'
-            )
-            widget.place(x=x, y=y)
+        self.label = ttk.Label(
+            self.playground_canvas,
+            text=text,
+            style='Level.TLabel'
+        )
+        self.label.place(x=x, y=y)
 
-        if time == 0:
-            self.master.after_cancel(self._job)
-            self._job = None
+        self._label_job = self.timers.after(time * 1000, self.hide_label)
 
-            widget.destroy()
+    def hide_label(self):
+        '''Removes the shown label'''
 
-            # Allows platform motion again
-            self.playground_canvas.bind('<Motion>', self.move_platform)
+        self._label_job = None
+        self.label.destroy()
+        self.label = None
+
+        # Allows platform motion again
+        self.playground_canvas.bind('<Motion>', self.move_platform)
 
-            return
 
-        self._job = self.master.after(
-            1000,
-            lambda: self.show_label(widget=widget, time=time-1)
+def board_size(text):
+    '''Parses rows and columns of generated levels, e.g. "100x200".
+
+    Parameters
+    ----------
+        text : str
+            Rows and columns separated by "x"
+
+    Returns
+    -------
+        board : tuple
+            Number of rows and number of columns
+    '''
+
+    try:
+        rows, columns = map(int, text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(
+            f'{text!r} isn\'t rows and columns like 12x18'
         )
 
+    if rows < 1 or columns < 1:
+        raise argparse.ArgumentTypeError(
+            f'{text!r} needs at least one row and one column'
+        )
+
+    return rows, columns
+
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Arkanoid game')
+    parser.add_argument(
+        '--tick-rate',
+        type=int,
+        default=120,
+        help='number of simulation ticks per second'
+    )
+    parser.add_argument(
+        '--frame-rate',
+        type=int,
+        default=60,
+        help='number of drawn frames per second'
+    )
+    parser.add_argument(
+        '--profile',
+        metavar='PATH',
+        help='records frame times and writes them to a CSV or JSON file '
+        'on exit'
+    )
+    parser.add_argument(
+        '--seed', type=int, help='seed of the game, random if omitted'
+    )
+    parser.add_argument(
+        '--record',
+        metavar='PATH',
+        help='records the game into a file that can be replayed with '
+        'replay.py'
+    )
+    parser.add_argument(
+        '--balls',
+        type=int,
+        default=1,
+        help='number of balls the ball splits into when it is shot'
+    )
+    parser.add_argument(
+        '--levels',
+        metavar='PATH',
+        help='path to a levels JSON file or to a compiled pack'
+    )
+    parser.add_argument(
+        '--endless',
+        action='store_true',
+        help='plays endless generated levels'
+    )
+    parser.add_argument(
+        '--board',
+        type=board_size,
+        default='12x18',
+        help='rows and columns of generated levels, e.g. 100x200'
+    )
+    parser.add_argument(
+        '--no-power-ups',
+        action='store_true',
+        help='hit blocks don\'t drop power-ups'
+    )
+    parser.add_argument(
+        '--particle-budget',
+        type=float,
+        default=2,
+        metavar='MS',
+        help='milliseconds a frame may spend on particle effects, 0 turns '
+        'them off'
+    )
+    parser.add_argument(
+        '--scores',
+        metavar='PATH',
+        help='keeps high scores, clear times of levels and statistics of '
+        'games in an SQLite database'
+    )
+    parser.add_argument(
+        '--sessions',
+        type=int,
+        default=1,
+        help='number of games played side by side in separate windows, '
+        'e.g. for tournaments'
+    )
+    parser.add_argument(
+        '--overlay',
+        action='store_true',
+        help='shows frame statistics on the screen'
+    )
+    parser.add_argument(
+        '--startup-profile',
+        action='store_true',
+        help='prints how long startup stages take and exits once the '
+        'assets are loaded'
+    )
+    args = parser.parse_args()
+
+    # Optional features are imported only when they are used
+    startup = None
+    if args.startup_profile:
+        from profiler import StartupTimer
+        startup = StartupTimer(STARTED)
+        startup.mark('imports', IMPORTED)
+
+    profiler = None
+    if args.profile or args.overlay:
+        from profiler import FrameProfiler
+        profiler = FrameProfiler()
+
+    seed = args.seed
+    if seed is None:
+        seed = random.randrange(2**32)
+
+    levels = None
+    board = None
+    pack = 'levels.json'
+    if args.endless:
+        from level_generator import ProceduralLevels
+        board = args.board
+        levels = ProceduralLevels(seed, *board)
+        pack = f'endless {board[0]}x{board[1]}'
+    elif args.levels:
+        levels = get_level_store(args.levels)
+        pack = os.path.basename(args.levels)
+
+    # Endless levels are generated again from the seed by replays
+    recorder = None
+    if args.record:
+        from replay import Recording
+        recorder = Recording(seed, args.tick_rate, board=board)
+
+    scores = None
+    if args.scores:
+        from score_store import ScoreStore
+        scores = ScoreStore(args.scores)
+
     root = Tk()
-    app = ArkanoidGame(root)
-    root.mainloop()
\ No newline at end of file
+    if startup is not None:
+        startup.mark('tk')
+
+    # Games share one scheduler, the first one is recorded and profiled
+    scheduler = Scheduler(root)
+    apps = []
+    for index in range(max(args.sessions, 1)):
+        window = root
+        if index:
+            window = Toplevel(root)
+
+        apps.append(ArkanoidGame(
+            window,
+            tick_rate=args.tick_rate,
+            frame_rate=args.frame_rate,
+            profiler=profiler if not index else None,
+            overlay=args.overlay and not index,
+            seed=seed + index,
+            recorder=recorder if not index else None,
+            balls=args.balls,
+            levels=levels,
+            startup=startup if not index else None,
+            scores=scores,
+            pack=pack,
+            power_ups=not args.no_power_ups,
+            particle_budget=args.particle_budget / 1000,
+            scheduler=scheduler
+        ))
+
+        # Windows don't cover each other completely
+        if index:
+            window.geometry(f'+{100 + 40*index}+{200 + 40*index}')
+    app = apps[0]
+    root.mainloop()
+
+    # Games left in the middle are saved too
+    if scores is not None:
+        for each in apps:
+            each.save_session()
+        scores.close()
+
+    if recorder is not None and app.engine:
+        recorder.finish(app.engine)
+        recorder.save(args.record)
+
+    if args.profile:
+        profiler.dump(args.profile)
\ No newline at end of file
@@ -0,0 +1,480 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import os
+import platform
+from random import Random
+import sys
+import time
+
+from engine import GameEngine
+from level_generator import generate_level
+from level_generator import ProceduralLevels
+from level_store import DEFAULT_LEVELS
+from level_store import LevelStore
+from power_ups import LASER
+from power_ups import SLOW
+from sprites import SpriteCache
+
+
+game_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+def best_time(function, repeat, number):
+    '''Measures a function.
+
+    Parameters
+    ----------
+        function : function
+            Function without arguments
+        repeat : int
+            Number of measurements
+        number : int
+            Number of calls in a measurement
+
+    Returns
+    -------
+        seconds : float
+            The fastest time of one call
+    '''
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        best = min(best, (time.perf_counter() - start) / number)
+
+    return best
+
+
+def full_board_engine(blocks_left, seed=0):
+    '''Creates an engine with a board of given number of blocks.
+
+    Parameters
+    ----------
+        blocks_left : int
+            Number of blocks left on the board
+        seed : int
+            Seed that picks the removed blocks
+    '''
+
+    # Sizes of the board
+    engine = GameEngine(LevelStore({}, {}))
+    matrix = [['b'] * engine.columns for _ in range(engine.rows)]
+
+    engine = GameEngine(LevelStore.from_levels({'level1': matrix}), seed=seed)
+    engine.load_level()
+
+    cells = [
+        (row, column)
+        for row in range(engine.rows)
+        for column in range(engine.columns)
+    ]
+    Random(seed).shuffle(cells)
+    for row, column in cells[:len(cells) - blocks_left]:
+        engine.blocks.remove(engine.blocks.index(row, column))
+
+    return engine
+
+
+def bench_collision(metrics, quick):
+    '''Measures a tick of check_collision against the number of blocks
+    left on the board'''
+
+    engine = full_board_engine(0)
+    full = engine.rows * engine.columns
+
+    for blocks_left in (full, full*3//4, full//2, full//4, full//8, 1):
+        engine = full_board_engine(blocks_left)
+        blocks = engine.blocks
+        ball = engine.ball
+        engine.launch()
+
+        # The ball crosses the board, hit blocks are put back
+        points = [
+            (100 + i*47 % 1000, 80 + i*29 % 460) for i in range(100)
+        ]
+
+        def ticks():
+            for x, y in points:
+                ball.x = x
+                ball.y = y
+                engine.check_collision()
+
+            for block in engine.removed_blocks:
+                row, column = divmod(block, blocks.columns)
+                blocks.add(row, column, blocks.variants[block])
+            engine.removed_blocks = []
+
+        seconds = best_time(ticks, 3 if quick else 7, 20) / len(points)
+        metrics[f'check_collision.{blocks_left}_blocks'] = {
+            'value': seconds * 1e6, 'unit': 'us', 'better': 'lower'
+        }
+
+
+def bench_level_loading(metrics, quick):
+    '''Measures loading of a level, cold and warm'''
+
+    pics_dir = os.path.join(game_dir, 'pics')
+
+    def cold():
+        store = LevelStore.from_json(DEFAULT_LEVELS)
+        sprites = SpriteCache(pics_dir)
+        engine = GameEngine(store)
+        engine.load_level()
+        for block in engine.blocks:
+            sprites.image('block_' + str(engine.blocks.variants[block]))
+
+    store = LevelStore.from_json(DEFAULT_LEVELS)
+    sprites = SpriteCache(pics_dir)
+    engine = GameEngine(store)
+
+    def warm():
+        engine.load_level()
+        for block in engine.blocks:
+            sprites.image('block_' + str(engine.blocks.variants[block]))
+
+    repeat = 3 if quick else 7
+    metrics['create_level.cold'] = {
+        'value': best_time(cold, repeat, 5) * 1e3,
+        'unit': 'ms',
+        'better': 'lower'
+    }
+    metrics['create_level.warm'] = {
+        'value': best_time(warm, repeat, 50) * 1e3,
+        'unit': 'ms',
+        'better': 'lower'
+    }
+
+
+def bench_move_platform(metrics, quick):
+    '''Measures handling of one motion event before the ball is shot'''
+
+    engine = GameEngine(
+        LevelStore.from_json(DEFAULT_LEVELS)
+    )
+    positions = [(i * 37) % int(engine.width) for i in range(1000)]
+
+    def motion():
+        for x in positions:
+            engine.move_platform(x)
+
+    seconds = best_time(motion, 3 if quick else 7, 5) / len(positions)
+    metrics['move_platform'] = {
+        'value': seconds * 1e6, 'unit': 'us', 'better': 'lower'
+    }
+
+
+def bench_ticks(metrics, quick):
+    '''Measures steady state ticks per second of a played level'''
+
+    store = LevelStore.from_json(DEFAULT_LEVELS)
+    ticks = 5000 if quick else 20000
+
+    best = 0
+    for _ in range(3):
+        engine = GameEngine(store, seed=0)
+        engine.state.lives = ticks
+        engine.load_level()
+        engine.launch()
+
+        start = time.perf_counter()
+        for _ in range(ticks):
+            engine.move_platform(engine.ball.x)
+            if engine.step() != 'OK':
+                engine.launch()
+        best = max(best, ticks / (time.perf_counter() - start))
+
+    metrics['ticks_per_second'] = {
+        'value': best, 'unit': 'ticks/s', 'better': 'higher'
+    }
+
+
+def bench_multi_ball(metrics, quick):
+    '''Measures a tick against the number of balls in play'''
+
+    store = LevelStore.from_json(DEFAULT_LEVELS)
+
+    for balls in (1, 16, 128):
+        engine = GameEngine(store, seed=0)
+        engine.state.lives = 10**9
+
+        # Balls fly from the platform to the blocks and back
+        def ticks():
+            engine.load_level()
+            engine.reset_objects()
+            engine.launch()
+            engine.add_balls(balls - 1)
+
+            for _ in range(100):
+                engine.move_platform(engine.ball.x)
+                engine.step()
+
+        seconds = best_time(ticks, 3 if quick else 7, 3) / 100
+        metrics[f'tick.{balls}_balls'] = {
+            'value': seconds * 1e6, 'unit': 'us', 'better': 'lower'
+        }
+
+
+def bench_power_ups(metrics, quick):
+    '''Measures a tick with full pools of falling power-ups and laser
+    shots'''
+
+    store = LevelStore.from_json(DEFAULT_LEVELS)
+    engine = GameEngine(store, seed=0, power_ups=True)
+    engine.state.lives = 10**9
+
+    # Every pool slot is used, like after a long chain of hits
+    def ticks():
+        engine.load_level()
+        engine.reset_objects()
+        engine.launch()
+        engine.start_effect(LASER)
+
+        random = engine.random
+        while engine.items.spawn(
+                random.uniform(0, engine.width), random.uniform(0, 300),
+                SLOW):
+            pass
+        while engine.shots.spawn(
+                random.uniform(0, engine.width),
+                random.uniform(engine.height/2, engine.height)):
+            pass
+
+        for _ in range(100):
+            engine.move_platform(engine.ball.x)
+            engine.step()
+
+    seconds = best_time(ticks, 3 if quick else 7, 3) / 100
+    metrics['tick.power_ups'] = {
+        'value': seconds * 1e6, 'unit': 'us', 'better': 'lower'
+    }
+
+
+def bench_big_board(metrics, quick):
+    '''Measures generation and loading of a 100x200 level and its ticks'''
+
+    rows, columns = 100, 200
+    levels = ProceduralLevels(0, rows, columns)
+    engine = GameEngine(levels, seed=0)
+    repeat = 3 if quick else 7
+
+    metrics[f'generate_level.{rows}x{columns}'] = {
+        'value': best_time(
+            lambda: generate_level(0, 3, rows, columns), repeat, 5
+        ) * 1e3,
+        'unit': 'ms',
+        'better': 'lower'
+    }
+    metrics[f'load_level.{rows}x{columns}'] = {
+        'value': best_time(lambda: engine.load_level(3), repeat, 5) * 1e3,
+        'unit': 'ms',
+        'better': 'lower'
+    }
+
+    engine.state.lives = 10**9
+    engine.launch()
+
+    def ticks():
+        for _ in range(1000):
+            engine.move_platform(engine.ball.x)
+            if engine.step() != 'OK':
+                engine.launch()
+
+    metrics[f'tick.{rows}x{columns}'] = {
+        'value': best_time(ticks, repeat, 1) / 1000 * 1e6,
+        'unit': 'us',
+        'better': 'lower'
+    }
+
+
+def bench_framebuffer(metrics, quick):
+    '''Measures drawing of a frame into the offscreen buffer, if NumPy
+    is installed'''
+
+    try:
+        from framebuffer import FrameRenderer
+    except ImportError:
+        return False
+
+    engine = GameEngine(
+        LevelStore.from_json(DEFAULT_LEVELS),
+        seed=0
+    )
+    engine.state.lives = 10**9
+    engine.load_level()
+    engine.launch()
+    renderer = FrameRenderer(engine, os.path.join(game_dir, 'pics'))
+    renderer.render()
+
+    def frame():
+        engine.move_platform(engine.ball.x)
+        if engine.step() != 'OK':
+            engine.launch()
+        renderer.render()
+
+    metrics['framebuffer.frame'] = {
+        'value': best_time(frame, 3, 200 if quick else 1000) * 1e6,
+        'unit': 'us',
+        'better': 'lower'
+    }
+
+    return True
+
+
+def bench_tk(metrics, quick):
+    '''Measures drawing with tkinter, if there is a display'''
+
+    try:
+        from tkinter import Tk
+        from tkinter import TclError
+        root = Tk()
+    except (ImportError, TclError):
+        return False
+
+    from arkanoid import ArkanoidGame
+
+    class Event:
+        x = 0
+        y = 0
+
+    try:
+        game = ArkanoidGame(root)
+        game.prepare_for_game()
+        event = Event()
+
+        def motion():
+            event.x = (event.x + 37) % 1180
+            game.move_platform(event)
+            game.flush_canvas()
+            root.update_idletasks()
+
+        metrics['tk.move_platform'] = {
+            'value': best_time(motion, 3, 200 if quick else 1000) * 1e6,
+            'unit': 'us',
+            'better': 'lower'
+        }
+
+        def frame():
+            game.redraw_ball()
+            game.flush_canvas()
+            root.update_idletasks()
+
+        metrics['tk.frame'] = {
+            'value': best_time(frame, 3, 200 if quick else 1000) * 1e6,
+            'unit': 'us',
+            'better': 'lower'
+        }
+    finally:
+        root.destroy()
+
+    return True
+
+
+def compare(metrics, baseline, tolerance):
+    '''Finds metrics that became worse than in the baseline.
+
+    Parameters
+    ----------
+        metrics : dict
+            Measured metrics
+        baseline : dict
+            Metrics of the baseline
+        tolerance : float
+            Allowed relative change, e.g. 0.2 for 20%
+
+    Returns
+    -------
+        regressions : list
+            Tuples of metric\'s name, baseline value and current value
+    '''
+
+    regressions = []
+    for name, metric in metrics.items():
+        if name not in baseline:
+            continue
+
+        old = baseline[name]['value']
+        new = metric['value']
+        if metric['better'] == 'lower':
+            worse = new > old * (1 + tolerance)
+        else:
+            worse = new < old * (1 - tolerance)
+
+        if worse:
+            regressions.append((name, old, new))
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Measures performance of the game'
+    )
+    parser.add_argument(
+        '--output', help='path to a JSON file to write results to'
+    )
+    parser.add_argument(
+        '--baseline', help='path to a JSON file with baseline results'
+    )
+    parser.add_argument(
+        '--save-baseline',
+        action='store_true',
+        help='writes results into the baseline file instead of comparing'
+    )
+    parser.add_argument(
+        '--tolerance',
+        type=float,
+        default=0.2,
+        help='allowed relative slowdown against the baseline'
+    )
+    parser.add_argument(
+        '--quick', action='store_true', help='runs fewer measurements'
+    )
+    args = parser.parse_args()
+
+    metrics = {}
+    bench_collision(metrics, args.quick)
+    bench_level_loading(metrics, args.quick)
+    bench_move_platform(metrics, args.quick)
+    bench_ticks(metrics, args.quick)
+    bench_multi_ball(metrics, args.quick)
+    bench_power_ups(metrics, args.quick)
+    bench_big_board(metrics, args.quick)
+    if not bench_framebuffer(metrics, args.quick):
+        print('No NumPy, framebuffer benchmark is skipped')
+    if not bench_tk(metrics, args.quick):
+        print('No display, tkinter benchmarks are skipped')
+
+    for name, metric in metrics.items():
+        print(f'{name:<32} {metric["value"]:>12.2f} {metric["unit"]}')
+
+    results = {
+        'python': platform.python_version(),
+        'platform': sys.platform,
+        'metrics': metrics
+    }
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=4)
+    elif args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)['metrics']
+
+        regressions = compare(metrics, baseline, args.tolerance)
+        for name, old, new in regressions:
+            print(f'REGRESSION {name}: {old:.2f} -> {new:.2f}')
+
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
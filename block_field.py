@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+
+from array import array
+import math
+
+
+class BlockField:
+    '''Blocks placed on a uniform grid. Each cell holds at most one
+    block, so the cells overlapped by a box are found in constant time
+    no matter how many blocks there are.
+
+    Blocks aren\'t objects. A block is the index "row*columns + column"
+    of its cell in typed arrays of coordinates, image variations and
+    canvas items, and a bit of the alive bitmask. Removing a block only
+    clears its bit.
+
+    Attributes
+    ----------
+        rows : int
+            Number of grid rows
+        columns : int
+            Number of grid columns
+        x : float
+            X coordinate of the first block\'s center
+        y : float
+            Y coordinate of the first block\'s center
+        cell_width : float
+            Width of a block
+        cell_height : float
+            Height of a block
+    '''
+
+    def __init__(self, rows, columns, x, y, cell_width, cell_height):
+        self.rows = rows
+        self.columns = columns
+        self.x = x
+        self.y = y
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+
+        # Left and top edges of the grid
+        self.left = x - cell_width/2
+        self.top = y - cell_height/2
+
+        # x,y of cells' centers
+        size = rows * columns
+        self.xs = array(
+            'd', (x + column*cell_width for column in range(columns))
+        ) * rows
+        self.ys = array('d', (
+            y + row*cell_height
+            for row in range(rows)
+            for _ in range(columns)
+        ))
+        self.variants = array('B', bytes(size))
+        self.items = array('l', [0]) * size
+        self.alive = bytearray((size + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        '''Iterates over indices of the blocks starting from the last
+        cell'''
+
+        alive = self.alive
+        for byte_index in range(len(alive)-1, -1, -1):
+            byte = alive[byte_index]
+            while byte:
+                bit = byte.bit_length() - 1
+                byte ^= 1 << bit
+
+                yield byte_index*8 + bit
+
+    def index(self, row, column):
+        '''Returns index of a cell.
+
+        Parameters
+        ----------
+            row : int
+                Row of a cell
+            column : int
+                Column of a cell
+        '''
+
+        return row*self.columns + column
+
+    def is_alive(self, index):
+        '''Returns whether there is a block in a cell.
+
+        Parameters
+        ----------
+            index : int
+                Index of a cell
+        '''
+
+        return self.alive[index >> 3] >> (index & 7) & 1
+
+    def cell_center(self, row, column):
+        '''Returns x,y of a cell\'s center.
+
+        Parameters
+        ----------
+            row : int
+                Row of a cell
+            column : int
+                Column of a cell
+        '''
+
+        return (
+            self.x + column*self.cell_width,
+            self.y + row*self.cell_height
+        )
+
+    def add(self, row, column, variant=1):
+        '''Puts a block into a cell.
+
+        Parameters
+        ----------
+            row : int
+                Row of a cell
+            column : int
+                Column of a cell
+            variant : int
+                Number of a block\'s image variation
+
+        Returns
+        -------
+            index : int
+                Index of the block
+        '''
+
+        index = row*self.columns + column
+        if not self.is_alive(index):
+            self.alive[index >> 3] |= 1 << (index & 7)
+            self.count += 1
+
+        self.variants[index] = variant
+        self.items[index] = 0
+
+        return index
+
+    def remove(self, index):
+        '''Removes a block. Its variation and canvas item are kept, so
+        they can still be used to erase it from the screen.
+
+        Parameters
+        ----------
+            index : int
+                Index of a block
+        '''
+
+        if self.is_alive(index):
+            self.alive[index >> 3] &= ~(1 << (index & 7)) & 0xff
+            self.count -= 1
+
+    def query(self, left, top, right, bottom):
+        '''Finds blocks whose cells touch a box, starting from the last
+        cell.
+
+        Parameters
+        ----------
+            left : float
+                Left edge of a box
+            top : float
+                Top edge of a box
+            right : float
+                Right edge of a box
+            bottom : float
+                Bottom edge of a box
+
+        Returns
+        -------
+            blocks : list
+                Indices of the blocks
+        '''
+
+        first_column = max(
+            math.ceil((left - self.left)/self.cell_width) - 1, 0
+        )
+        last_column = min(
+            math.floor((right - self.left)/self.cell_width), self.columns-1
+        )
+        first_row = max(
+            math.ceil((top - self.top)/self.cell_height) - 1, 0
+        )
+        last_row = min(
+            math.floor((bottom - self.top)/self.cell_height), self.rows-1
+        )
+
+        alive = self.alive
+        found = []
+        for row in range(last_row, first_row-1, -1):
+            for column in range(last_column, first_column-1, -1):
+                index = row*self.columns + column
+                if alive[index >> 3] >> (index & 7) & 1:
+                    found.append(index)
+
+        return found
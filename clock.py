@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import time
+
+
+class FixedTimestepClock:
+    '''Simulation clock that runs the game with a fixed timestep no
+    matter how often frames are drawn. Real time is collected in an
+    accumulator and paid out in whole ticks.
+
+    Attributes
+    ----------
+        tick_rate : int
+            Number of simulation ticks per second
+        max_ticks : int
+            Maximal number of ticks per frame. Time beyond it is dropped,
+            so a stalled frame doesn\'t snowball into slower ones.
+        timer : function
+            Function that returns current time in seconds
+    '''
+
+    def __init__(self, tick_rate=120, max_ticks=10, timer=time.perf_counter):
+        self.tick_rate = tick_rate
+        self.max_ticks = max_ticks
+        self.timer = timer
+        self.timestep = 1 / tick_rate
+        self.reset()
+
+    def reset(self):
+        '''Starts counting time from now'''
+
+        self.last_time = self.timer()
+        self.accumulator = 0
+
+    def advance(self):
+        '''Collects time passed since the previous call.
+
+        Returns
+        -------
+            ticks : int
+                Number of ticks to simulate in this frame
+        '''
+
+        now = self.timer()
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        ticks = int(self.accumulator / self.timestep)
+        if ticks > self.max_ticks:
+            ticks = self.max_ticks
+            self.accumulator = 0
+        else:
+            self.accumulator -= ticks * self.timestep
+
+        return ticks
+
+    @property
+    def alpha(self):
+        '''Part of a tick accumulated after the last whole tick. Used to
+        interpolate drawn positions between two ticks.'''
+
+        return self.accumulator / self.timestep
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+import math
+
+
+def sweep_box(x, y, dx, dy, left, top, right, bottom):
+    '''Finds when a moving point enters a box. Boxes of moving objects
+    have to be expanded by their half sizes beforehand.
+
+    Parameters
+    ----------
+        x : float
+            X coordinate of a point at the beginning of a move
+        y : float
+            Y coordinate of a point at the beginning of a move
+        dx : float
+            Movement along the x axis
+        dy : float
+            Movement along the y axis
+        left : float
+            Left edge of a box
+        top : float
+            Top edge of a box
+        right : float
+            Right edge of a box
+        bottom : float
+            Bottom edge of a box
+
+    Returns
+    -------
+        impact : tuple
+            Time of impact between 0 and 1 and x,y of the hit side\'s
+            normal, or None if the point doesn\'t enter the box
+    '''
+
+    # Times of entering and leaving the box along the x axis
+    if dx > 0:
+        entry_x = (left - x) / dx
+        exit_x = (right - x) / dx
+    elif dx < 0:
+        entry_x = (right - x) / dx
+        exit_x = (left - x) / dx
+    elif left <= x <= right:
+        entry_x = -math.inf
+        exit_x = math.inf
+    else:
+        return None
+
+    # Times of entering and leaving the box along the y axis
+    if dy > 0:
+        entry_y = (top - y) / dy
+        exit_y = (bottom - y) / dy
+    elif dy < 0:
+        entry_y = (bottom - y) / dy
+        exit_y = (top - y) / dy
+    elif top <= y <= bottom:
+        entry_y = -math.inf
+        exit_y = math.inf
+    else:
+        return None
+
+    entry = max(entry_x, entry_y)
+    if entry > min(exit_x, exit_y) or entry < 0 or 1 < entry:
+        return None
+
+    # Side that was crossed last is the hit one. Both sides are hit
+    # when the point enters exactly through a corner.
+    normal_x = 0
+    normal_y = 0
+    if entry_x >= entry_y:
+        normal_x = -1 if dx > 0 else 1
+    if entry_y >= entry_x:
+        normal_y = -1 if dy > 0 else 1
+
+    return entry, normal_x, normal_y
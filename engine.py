@@ -0,0 +1,816 @@
+#!/usr/bin/env python3
+
+import math
+from random import Random
+
+from block_field import BlockField
+from collision import sweep_box
+from game_objects import Ball
+from game_objects import Platform
+from game_state import GameState
+from power_ups import ItemPool
+from power_ups import KINDS
+from power_ups import LASER
+from power_ups import MULTI_BALL
+from power_ups import SLOW
+from power_ups import WIDER
+
+
+class GameEngine:
+    '''Headless simulation of the game rules. It knows nothing about
+    tkinter, so it can be stepped without a display.
+
+    Attributes
+    ----------
+        levels : object
+            LevelStore object or any object with level(number) and
+            "in" check of level numbers, e.g. ProceduralLevels
+        width : float
+            Width of the playground
+        height : float
+            Height of the playground
+        seed : int
+            Seed of the random generator that picks blocks' variations
+        tick_rate : int
+            Number of simulation ticks per second
+        power_ups : bool
+            Whether hit blocks drop power-ups
+    '''
+
+    # Number of blocks\' pictures, known before an engine is created
+    blocks_variations = 7
+
+    def __init__(self, levels, width=1180, height=730, seed=None,
+            tick_rate=120, power_ups=False):
+        self.levels = levels
+        self.width = width
+        self.height = height
+        self.random = Random(seed)
+        self.tick_rate = tick_rate
+
+        self.normal_platform_width = 90
+        self.platform_width = self.normal_platform_width
+        self.platform_height = 20
+        # x,y of platform's center at the beginning
+        self.platform_start = (571, 680)
+        self.ball_width = 15
+        self.ball_height = 15
+        # Pixels per second
+        self.ball_speed = 600
+        # Biggest block, blocks of bigger levels shrink to fit the board
+        self.max_block_width = 58
+        self.max_block_height = 37
+        # x,y of board's top left corner and its size, 18x12 of the
+        # biggest blocks
+        self.board_start = (71, 81.5)
+        self.board_size = (1044, 444)
+        self.max_impacts = 8
+        self.max_balls = 256
+
+        # Power-ups fall from a part of hit blocks, effects last for
+        # effect_time seconds
+        self.power_ups = power_ups
+        self.drop_chance = 0.15
+        self.item_width = 30
+        self.item_height = 14
+        self.item_speed = 180
+        self.effect_time = 10
+        self.wider_factor = 1.5
+        self.slow_factor = 0.6
+        self.balls_per_power_up = 2
+        # Laser shoots two beams from platform's edges every interval
+        self.shot_width = 4
+        self.shot_height = 14
+        self.shot_speed = 900
+        self.shot_interval = 0.25
+        # Pools are allocated once, extra items are skipped
+        self.items = ItemPool(32)
+        self.shots = ItemPool(64)
+        # End tick of every active effect
+        self.effects = {}
+
+        self.set_board(12, 18)
+
+        self.state = GameState()
+        self.ticks = 0
+        self.blocks = self.create_block_field()
+        self.removed_blocks = []
+
+        # Records player's inputs when set, see replay.Recording
+        self.recorder = None
+
+        self.reset_objects()
+
+    @property
+    def ball(self):
+        '''The first ball in play, the one shot from the platform'''
+
+        return self.balls[0]
+
+    def reset_objects(self):
+        '''Puts the platform at the beginning and one ball on top of it'''
+
+        self.ball_shot = False
+        self.state.combo = 0
+
+        # Power-ups are lost together with the ball
+        self.items.clear()
+        self.shots.clear()
+        self.effects = {}
+        self.platform_width = self.normal_platform_width
+
+        x, y = self.platform_start
+        self.platform = Platform(None, x, y)
+        self.place_ball()
+
+    def place_ball(self):
+        '''Puts the ball in the center of the platform'''
+
+        # x,y of ball's center
+        x = self.platform.x
+        y = self.platform.y - self.platform_height/2 - self.ball_height/2
+
+        self.balls = [Ball(None, x, y, self.ball_speed/self.tick_rate)]
+
+    def add_balls(self, count):
+        '''Splits the first ball into more balls flying upwards at
+        random angles, up to max_balls in play.
+
+        Parameters
+        ----------
+            count : int
+                Number of added balls
+
+        Returns
+        -------
+            added : int
+                Number of balls actually added
+        '''
+
+        if self.recorder is not None:
+            self.recorder.record_split(self.ticks, count)
+
+        return self.split_ball(count)
+
+    def split_ball(self, count):
+        '''Adds balls like add_balls, but isn\'t recorded as player\'s
+        input, e.g. for the multi-ball power-up.
+
+        Parameters
+        ----------
+            count : int
+                Number of added balls
+
+        Returns
+        -------
+            added : int
+                Number of balls actually added
+        '''
+
+        source = self.ball
+        count = max(min(count, self.max_balls - len(self.balls)), 0)
+
+        for _ in range(count):
+            ball = Ball(None, source.x, source.y, source.movement_speed)
+
+            # Same speed as a diagonal ball with directions of 1
+            angle = self.random.uniform(math.pi/6, math.pi*5/6)
+            ball.x_direction = math.sqrt(2) * math.cos(angle)
+            ball.y_direction = -math.sqrt(2) * math.sin(angle)
+
+            self.balls.append(ball)
+
+        return count
+
+    def set_board(self, rows, columns):
+        '''Sizes blocks so that a grid of given size fits the board.
+
+        Parameters
+        ----------
+            rows : int
+                Number of grid rows
+            columns : int
+                Number of grid columns
+        '''
+
+        self.rows = rows
+        self.columns = columns
+        self.block_width, self.block_height = self.block_size(rows, columns)
+
+        # x,y of the first block's center
+        left, top = self.board_start
+        self.blocks_start = (
+            left + self.block_width/2, top + self.block_height/2
+        )
+
+    def block_size(self, rows, columns):
+        '''Returns width,height of blocks of a grid that fits the board.
+
+        Parameters
+        ----------
+            rows : int
+                Number of grid rows
+            columns : int
+                Number of grid columns
+        '''
+
+        board_width, board_height = self.board_size
+
+        return (
+            min(self.max_block_width, board_width/columns),
+            min(self.max_block_height, board_height/rows)
+        )
+
+    def create_block_field(self):
+        '''Creates an empty grid of blocks.
+
+        Returns
+        -------
+            blocks : object
+                BlockField object
+        '''
+
+        x, y = self.blocks_start
+        return BlockField(
+            self.rows, self.columns,
+            x, y,
+            self.block_width, self.block_height
+        )
+
+    def load_level(self, level=1):
+        '''Creates blocks of a level. Size of the board is taken from the
+        level.
+
+        Parameters
+        ----------
+            level : int
+                Number of a level
+        '''
+
+        level_blocks = self.levels.level(level)
+
+        self.set_board(level_blocks.rows, level_blocks.columns)
+        self.blocks = self.create_block_field()
+
+        for i, j in level_blocks.cells():
+            variant = self.random.randint(1, self.blocks_variations)
+            self.blocks.add(i, j, variant)
+
+    def move_platform(self, x):
+        '''Moves the platform to a new x coordinate. The ball follows
+        the platform until it is shot.
+
+        Parameters
+        ----------
+            x : float
+                X coordinate of platform's center
+        '''
+
+        if self.recorder is not None:
+            self.recorder.record_motion(self.ticks, x)
+
+        # Stops platform at the left edge
+        if x < self.platform_width/2:
+            x = self.platform_width/2
+
+        # Stops platform at the right edge
+        if self.width-self.platform_width/2 < x:
+            x = self.width - self.platform_width/2
+
+        self.platform.x = x
+
+        if not self.ball_shot:
+            self.place_ball()
+
+    def launch(self):
+        '''Shoots the ball from the platform'''
+
+        if self.recorder is not None:
+            self.recorder.record_launch(self.ticks)
+
+        self.ball_shot = True
+
+    def step(self, n=1):
+        '''Advances the simulation by n ticks. Stops earlier if a life
+        is lost or a level is finished.
+
+        Parameters
+        ----------
+            n : int
+                Number of ticks
+
+        Returns
+        -------
+            result : str
+                "OK", "HIT", "LOST LIFE", "GAME OVER", "FINISHED LEVEL"
+                or "FINISHED GAME"
+        '''
+
+        self.removed_blocks = []
+        hit = False
+
+        for _ in range(n):
+            result = self.tick()
+            if result == 'HIT':
+                hit = True
+            elif result != 'OK':
+                return result
+
+        return 'HIT' if hit else 'OK'
+
+    def tick(self):
+        '''Advances the simulation by one tick.
+
+        Returns
+        -------
+            result : str
+                "OK", "HIT", "LOST LIFE", "GAME OVER", "FINISHED LEVEL"
+                or "FINISHED GAME"
+        '''
+
+        # The ball waits on the platform until it is shot
+        state = self.state
+        if not self.ball_shot or not state.lives:
+            return 'OK'
+
+        self.ticks += 1
+        result = 'OK'
+        fallen = None
+
+        for ball in self.balls:
+            ball.remember_position()
+            ball_result = self.check_collision(ball)
+
+            if ball_result == 'HIT':
+                result = 'HIT'
+            elif ball_result == 'FELL':
+                if fallen is None:
+                    fallen = set()
+                fallen.add(ball)
+            elif ball_result == 'WIN':
+                result = 'WIN'
+                break
+
+        # A life is lost only when the last ball falls
+        if fallen and result != 'WIN':
+            if len(fallen) < len(self.balls):
+                self.balls = [
+                    ball for ball in self.balls if ball not in fallen
+                ]
+            else:
+                result = 'LOST LIFE'
+
+        # After fallen balls are gone, so a multi-ball splits a live one
+        if self.power_ups and result in ('OK', 'HIT'):
+            if self.update_power_ups():
+                result = 'WIN'
+
+        if result == 'LOST LIFE':
+            state.lives -= 1
+            if state.lives == 0:
+                return 'GAME OVER'
+
+            self.reset_objects()
+            return result
+        elif result == 'WIN':
+            level = state.level + 1
+            if level not in self.levels:
+                self.ball_shot = False
+                return 'FINISHED GAME'
+
+            state.level = level
+            self.reset_objects()
+            self.load_level(level)
+            return 'FINISHED LEVEL'
+
+        return result
+
+    def check_collision(self, ball=None):
+        '''Moves a ball through one tick. The ball bounces off
+        everything on its way in the order of impact, so it can\'t pass
+        through the platform or blocks at any speed.
+
+        Parameters
+        ----------
+            ball : object
+                Ball object, the first ball if omitted
+
+        Returns
+        -------
+            result : str
+                "FELL", "HIT", "WIN" when there are no blocks left or
+                "OK"
+        '''
+
+        if ball is None:
+            ball = self.ball
+        result = 'OK'
+
+        # Platform could have been moved onto the ball
+        self.check_platform_collision(ball)
+
+        # Part of the tick that is left to move
+        time_left = 1
+
+        for _ in range(self.max_impacts):
+            dx = ball.movement_speed * ball.x_direction * time_left
+            dy = ball.movement_speed * ball.y_direction * time_left
+
+            # Broad phase, most balls of multi-ball fly in the open
+            if self.in_open_space(ball.x, ball.y, dx, dy):
+                ball.move(time_left)
+                break
+
+            impact = self.find_impact(ball, dx, dy)
+            if impact is None:
+                ball.move(time_left)
+                break
+
+            time, obstacle, normal_x, normal_y, block = impact
+            ball.move(time_left * time)
+            time_left -= time_left * time
+
+            if obstacle == 'FLOOR':
+                return 'FELL'
+
+            # Bounces off the hit side keeping ball\'s angle
+            if normal_x:
+                ball.x_direction = normal_x * abs(ball.x_direction)
+            if normal_y:
+                ball.y_direction = normal_y * abs(ball.y_direction)
+
+            if obstacle == 'PLATFORM':
+                self.state.combo = 0
+            elif obstacle == 'BLOCK':
+                self.delete_block(block)
+                result = 'HIT'
+
+                # Calculates the score
+                self.state.score += 100
+                self.state.combo += 1
+
+                # Checks whether there are any blocks left
+                if not self.blocks:
+                    return 'WIN'
+
+        return result
+
+    def in_open_space(self, x, y, dx, dy):
+        '''Checks whether ball\'s way stays away from the walls, the
+        platform and the blocks\' grid, so it can\'t hit anything.
+
+        Parameters
+        ----------
+            x : float
+                X coordinate of ball\'s center
+            y : float
+                Y coordinate of ball\'s center
+            dx : float
+                Ball\'s movement along the x axis
+            dy : float
+                Ball\'s movement along the y axis
+        '''
+
+        half_width = self.ball_width/2
+        half_height = self.ball_height/2
+
+        # Box swept by the ball
+        left = min(x, x+dx) - half_width
+        top = min(y, y+dy) - half_height
+        right = max(x, x+dx) + half_width
+        bottom = max(y, y+dy) + half_height
+
+        # Walls
+        if left < 0 or top < 0 or self.width < right\
+                or self.height < bottom:
+            return False
+
+        # Platform
+        platform = self.platform
+        if platform.y - self.platform_height/2 - half_height <= bottom\
+                and platform.x - self.platform_width/2 <= right\
+                and left <= platform.x + self.platform_width/2:
+            return False
+
+        # Blocks' grid
+        blocks = self.blocks
+        if top <= blocks.top + blocks.rows*blocks.cell_height\
+                and blocks.left <= right\
+                and left <= blocks.left + blocks.columns*blocks.cell_width:
+            return False
+
+        return True
+
+    def find_impact(self, ball, dx, dy):
+        '''Finds the first obstacle on a ball\'s way.
+
+        Parameters
+        ----------
+            ball : object
+                Ball object
+            dx : float
+                Ball\'s movement along the x axis
+            dy : float
+                Ball\'s movement along the y axis
+
+        Returns
+        -------
+            impact : tuple
+                Time of impact between 0 and 1, type of the obstacle,
+                x,y of the hit side\'s normal and index of the hit block,
+                or None if nothing is hit
+        '''
+
+        ball_x = ball.x
+        ball_y = ball.y
+        half_width = self.ball_width/2
+        half_height = self.ball_height/2
+
+        impacts = []
+
+        # Ball reaches left edge of the canvas
+        if dx < 0 and ball_x + dx < half_width:
+            time = max((half_width - ball_x) / dx, 0)
+            impacts.append((time, 'WALL', 1, 0, None))
+
+        # Ball reaches right edge of the canvas
+        if dx > 0 and self.width - half_width < ball_x + dx:
+            time = max((self.width - half_width - ball_x) / dx, 0)
+            impacts.append((time, 'WALL', -1, 0, None))
+
+        # Ball reaches upper edge of the canvas
+        if dy < 0 and ball_y + dy < half_height:
+            time = max((half_height - ball_y) / dy, 0)
+            impacts.append((time, 'WALL', 0, 1, None))
+
+        # Ball reaches bottom edge of the canvas
+        if dy > 0 and self.height - half_height < ball_y + dy:
+            time = max((self.height - half_height - ball_y) / dy, 0)
+            impacts.append((time, 'FLOOR', 0, 0, None))
+
+        # Ball reaches platform's top. Ball\'s center has to be above
+        # the platform like in check_platform_collision.
+        platform = self.platform
+        impact = sweep_box(
+            ball_x, ball_y, dx, dy,
+            platform.x - self.platform_width/2,
+            platform.y - self.platform_height/2 - half_height,
+            platform.x + self.platform_width/2,
+            platform.y + self.platform_height/2 - half_height
+        )
+        if impact and impact[2] == -1:
+            impacts.append((impact[0], 'PLATFORM', 0, -1, None))
+
+        # Only blocks in the cells along ball\'s way can be hit
+        candidates = self.blocks.query(
+            min(ball_x, ball_x+dx) - half_width,
+            min(ball_y, ball_y+dy) - half_height,
+            max(ball_x, ball_x+dx) + half_width,
+            max(ball_y, ball_y+dy) + half_height
+        )
+
+        for block in candidates:
+            # Block\'s edges expanded by ball\'s size
+            impact = self.sweep_block(block, ball_x, ball_y, dx, dy)
+            if impact:
+                time, normal_x, normal_y = impact
+                impacts.append((time, 'BLOCK', normal_x, normal_y, block))
+
+        if not impacts:
+            return None
+
+        # The earliest impact wins, ties go to the first found one
+        return min(impacts, key=lambda impact: impact[0])
+
+    def sweep_block(self, block, x, y, dx, dy):
+        '''Finds when the ball hits the block.
+
+        Parameters
+        ----------
+            block : int
+                Index of a block
+            x : float
+                X coordinate of ball\'s center
+            y : float
+                Y coordinate of ball\'s center
+            dx : float
+                Ball\'s movement along the x axis
+            dy : float
+                Ball\'s movement along the y axis
+
+        Returns
+        -------
+            impact : tuple
+                Time of impact and x,y of the hit side\'s normal, or
+                None if the block isn\'t hit
+        '''
+
+        half_width = (self.block_width + self.ball_width)/2
+        half_height = (self.block_height + self.ball_height)/2
+        block_x = self.blocks.xs[block]
+        block_y = self.blocks.ys[block]
+
+        return sweep_box(
+            x, y, dx, dy,
+            block_x - half_width,
+            block_y - half_height,
+            block_x + half_width,
+            block_y + half_height
+        )
+
+    def check_platform_collision(self, ball):
+        '''Checks a ball\'s collision with the platform.
+
+        Parameters
+        ----------
+            ball : object
+                Ball object
+        '''
+
+        ball_x = ball.x
+        ball_y = ball.y
+
+        # Ball's edges
+        ball_bottom = ball_y + self.ball_height/2
+
+        # Platform's edges
+        platform_left = self.platform.x - self.platform_width/2
+        platform_top = self.platform.y - self.platform_height/2
+        platform_right = self.platform.x + self.platform_width/2
+        platform_bottom = self.platform.y + self.platform_height/2
+
+        # Hits platform's top
+        if platform_left <= ball_x\
+                and platform_top <= ball_bottom\
+                and ball_x <= platform_right\
+                and ball_bottom <= platform_bottom:
+            ball.y_direction = -abs(ball.y_direction)
+            ball.y = platform_top - self.ball_height/2
+            self.state.combo = 0
+
+    def delete_block(self, block):
+        '''Deletes block from the game.
+
+        Parameters
+        ----------
+            block : int
+                Index of a block
+        '''
+
+        self.blocks.remove(block)
+        self.removed_blocks.append(block)
+
+        if self.power_ups and self.random.random() < self.drop_chance:
+            self.items.spawn(
+                self.blocks.xs[block], self.blocks.ys[block],
+                self.random.choice(KINDS)
+            )
+
+    def update_power_ups(self):
+        '''Moves falling power-ups and laser shots through one tick in
+        a single pass over each pool and ends expired effects.
+
+        Returns
+        -------
+            cleared : bool
+                True if a laser shot hit the last block
+        '''
+
+        ticks = self.ticks
+        effects = self.effects
+
+        if effects:
+            for kind, end in list(effects.items()):
+                if end <= ticks:
+                    self.end_effect(kind)
+
+        # Power-ups are caught by the platform or fall off the screen
+        items = self.items
+        if items.count:
+            platform = self.platform
+            catch_left = platform.x - self.platform_width/2\
+                - self.item_width/2
+            catch_right = platform.x + self.platform_width/2\
+                + self.item_width/2
+            catch_top = platform.y - self.platform_height/2\
+                - self.item_height/2
+            catch_bottom = platform.y + self.platform_height/2\
+                + self.item_height/2
+            fall = self.item_speed / self.tick_rate
+            xs, ys = items.xs, items.ys
+
+            for index in range(items.count-1, -1, -1):
+                y = ys[index] + fall
+                ys[index] = y
+
+                if catch_top <= y <= catch_bottom\
+                        and catch_left <= xs[index] <= catch_right:
+                    kind = items.kinds[index]
+                    items.remove(index)
+                    self.start_effect(kind)
+                elif y - self.item_height/2 > self.height:
+                    items.remove(index)
+
+        if LASER in effects:
+            interval = max(round(self.shot_interval * self.tick_rate), 1)
+            if ticks % interval == 0:
+                offset = self.platform_width/2 - self.shot_width
+                y = self.platform.y - self.platform_height/2
+                self.shots.spawn(self.platform.x - offset, y)
+                self.shots.spawn(self.platform.x + offset, y)
+
+        return self.update_shots()
+
+    def update_shots(self):
+        '''Moves laser shots up, a shot destroys the first block on its
+        way.
+
+        Returns
+        -------
+            cleared : bool
+                True if the last block is destroyed
+        '''
+
+        shots = self.shots
+        if not shots.count:
+            return False
+
+        blocks = self.blocks
+        rise = self.shot_speed / self.tick_rate
+        half_width = self.shot_width/2
+        half_height = self.shot_height/2
+        xs, ys = shots.xs, shots.ys
+
+        for index in range(shots.count-1, -1, -1):
+            x = xs[index]
+            y = ys[index]
+            ys[index] = y - rise
+
+            # Blocks come from the last cell, the lowest one is hit first
+            hit = blocks.query(
+                x - half_width, y - rise - half_height,
+                x + half_width, y + half_height
+            )
+            if hit:
+                shots.remove(index)
+                self.delete_block(hit[0])
+                self.state.score += 100
+
+                if not blocks:
+                    return True
+            elif y - rise + half_height < 0:
+                shots.remove(index)
+
+        return False
+
+    def start_effect(self, kind):
+        '''Applies a caught power-up. Catching an active one again
+        extends it.
+
+        Parameters
+        ----------
+            kind : int
+                Kind of the power-up, e.g. WIDER
+        '''
+
+        if kind == MULTI_BALL:
+            self.split_ball(self.balls_per_power_up)
+            return
+
+        self.effects[kind] = self.ticks\
+            + round(self.effect_time * self.tick_rate)
+
+        if kind == WIDER:
+            self.platform_width = self.normal_platform_width\
+                * self.wider_factor
+            self.keep_platform_inside()
+        elif kind == SLOW:
+            speed = self.ball_speed / self.tick_rate * self.slow_factor
+            for ball in self.balls:
+                ball.movement_speed = speed
+
+    def end_effect(self, kind):
+        '''Takes back an expired power-up.
+
+        Parameters
+        ----------
+            kind : int
+                Kind of the power-up, e.g. WIDER
+        '''
+
+        del self.effects[kind]
+
+        if kind == WIDER:
+            self.platform_width = self.normal_platform_width
+        elif kind == SLOW:
+            speed = self.ball_speed / self.tick_rate
+            for ball in self.balls:
+                ball.movement_speed = speed
+
+    def keep_platform_inside(self):
+        '''Moves a grown platform back between the walls'''
+
+        half_width = self.platform_width/2
+        self.platform.x = min(
+            max(self.platform.x, half_width), self.width - half_width
+        )
@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+
+import argparse
+import multiprocessing
+import os
+from random import Random
+import time
+
+import numpy as np
+
+from engine import GameEngine
+from level_store import DEFAULT_LEVELS
+from level_store import get_level_store
+
+
+# Actions of the platform
+STAY = 0
+LEFT = 1
+RIGHT = 2
+
+# Number of numbers about the ball and the platform before the blocks
+OBJECT_FEATURES = 6
+
+
+def board_cells(levels):
+    '''Returns number of cells of the biggest board among levels'''
+
+    # Sizes are known without decoding the levels
+    return max(
+        rows * columns
+        for rows, columns in map(levels.size, levels.numbers())
+    )
+
+
+class ArkanoidEnv:
+    '''Game rules wrapped into reset() and step(action) for training
+    and evaluating agents. It needs neither a display nor mouse events.
+
+    The ball is shot as soon as it is placed on the platform, so the
+    agent only moves the platform. Reward is the number of hit blocks
+    minus one for every lost life. An episode ends when the game is over,
+    all levels are finished or after max_ticks ticks.
+
+    Observations are written in place into the same array every step.
+
+    Attributes
+    ----------
+        levels : str
+            Path to the levels file
+        level : int
+            Number of the first level
+        frame_skip : int
+            Number of ticks simulated per step with the same action
+        platform_speed : float
+            Pixels the platform moves per tick
+        max_ticks : int
+            Number of ticks after which an episode ends
+        observation : str
+            "features" gives the ball\'s position and direction, the
+            platform\'s position, the number of balls and then bits of
+            the blocks, "pixels" gives RGB frames
+        seed : int
+            Seed of the first episode
+        observation_buffer : array
+            Array with the shape of observation_shape() to write
+            observations into, e.g. in shared memory, or None to
+            allocate one
+        power_ups : bool
+            Whether hit blocks drop power-ups
+    '''
+
+    def __init__(self, levels=None, level=1, frame_skip=4,
+            platform_speed=9, max_ticks=10000, observation='features',
+            seed=None, observation_buffer=None, power_ups=False):
+        if levels is None:
+            levels = DEFAULT_LEVELS
+        if observation not in ('features', 'pixels'):
+            raise ValueError(f'unknown observation "{observation}"')
+
+        self.levels = get_level_store(levels)
+        self.level = level
+        self.frame_skip = frame_skip
+        self.platform_speed = platform_speed
+        self.max_ticks = max_ticks
+        self.observation = observation
+        self.power_ups = power_ups
+        self.random = Random(seed)
+
+        self.cells = board_cells(self.levels)
+        self.engine = None
+        self.renderer = None
+
+        shape, dtype = self.observation_shape(self.cells, observation)
+        if observation_buffer is None:
+            observation_buffer = np.zeros(shape, dtype=dtype)
+        self.buffer = observation_buffer
+
+    @staticmethod
+    def observation_shape(cells, observation='features'):
+        '''Returns shape and type of observations.
+
+        Parameters
+        ----------
+            cells : int
+                Number of cells of the biggest board, see board_cells
+            observation : str
+                "features" or "pixels"
+
+        Returns
+        -------
+            shape : tuple
+                Shape of an observation
+            dtype : object
+                NumPy type of an observation
+        '''
+
+        if observation == 'pixels':
+            engine = GameEngine(None)
+            return (int(engine.height), int(engine.width), 3), np.uint8
+
+        return (OBJECT_FEATURES + cells,), np.float32
+
+    def reset(self, seed=None):
+        '''Starts a new episode.
+
+        Parameters
+        ----------
+            seed : int
+                Seed of the episode, or None to continue the sequence
+                of the previous episodes
+
+        Returns
+        -------
+            observation : array
+                The first observation
+        '''
+
+        if seed is not None:
+            self.random.seed(seed)
+
+        engine = GameEngine(
+            self.levels,
+            seed=self.random.getrandbits(32),
+            power_ups=self.power_ups
+        )
+        engine.state.level = self.level
+        engine.load_level(self.level)
+
+        # Platform starts at a random place
+        engine.move_platform(self.random.uniform(0, engine.width))
+        engine.launch()
+        self.engine = engine
+
+        if self.renderer is not None:
+            self.renderer.engine = engine
+
+        return self.observe()
+
+    def step(self, action):
+        '''Moves the platform and simulates frame_skip ticks.
+
+        Parameters
+        ----------
+            action : int
+                STAY, LEFT or RIGHT
+
+        Returns
+        -------
+            observation : array
+                Observation after the step
+            reward : float
+                Hit blocks minus lost lives
+            done : bool
+                True if the episode has ended
+            info : dict
+                Ticks, score and result of the step
+        '''
+
+        engine = self.engine
+        state = engine.state
+        score = state.score
+        lives = state.lives
+
+        if action == LEFT:
+            engine.move_platform(
+                engine.platform.x - self.platform_speed*self.frame_skip
+            )
+        elif action == RIGHT:
+            engine.move_platform(
+                engine.platform.x + self.platform_speed*self.frame_skip
+            )
+
+        result = engine.step(self.frame_skip)
+
+        # A new ball or level starts right away
+        if result in ('LOST LIFE', 'FINISHED LEVEL'):
+            engine.launch()
+
+        reward = (state.score - score)/100 - (lives - state.lives)
+        done = result in ('GAME OVER', 'FINISHED GAME')\
+            or engine.ticks >= self.max_ticks
+        info = {'ticks': engine.ticks, 'score': state.score, 'result': result}
+
+        return self.observe(), reward, done, info
+
+    def observe(self):
+        '''Writes the current observation into the buffer and returns it'''
+
+        if self.observation == 'pixels':
+            if self.renderer is None:
+                # Pillow is needed only for pictures
+                from framebuffer import FrameRenderer
+
+                pics_dir = os.path.join(
+                    os.path.dirname(os.path.realpath(__file__)), 'pics'
+                )
+                self.renderer = FrameRenderer(
+                    self.engine, pics_dir, buffer=self.buffer
+                )
+            self.renderer.render()
+            return self.buffer
+
+        engine = self.engine
+        ball = engine.ball
+        buffer = self.buffer
+        buffer[0] = ball.x / engine.width
+        buffer[1] = ball.y / engine.height
+        buffer[2] = ball.x_direction
+        buffer[3] = ball.y_direction
+        buffer[4] = engine.platform.x / engine.width
+        buffer[5] = len(engine.balls)
+
+        # One number per cell, 1 for a block
+        blocks = engine.blocks
+        size = blocks.rows * blocks.columns
+        bits = np.unpackbits(
+            np.frombuffer(blocks.alive, dtype=np.uint8), bitorder='little'
+        )
+        buffer[OBJECT_FEATURES:OBJECT_FEATURES+size] = bits[:size]
+        buffer[OBJECT_FEATURES+size:] = 0
+
+        return buffer
+
+
+def run_worker(connection, start, count, observations, rewards, dones,
+        actions, options):
+    '''Runs environments in a worker process. Observations, rewards and
+    done flags are written straight into shared memory, the connection
+    only carries commands and finished episodes.
+
+    Parameters
+    ----------
+        connection : object
+            Worker\'s end of a multiprocessing pipe
+        start : int
+            Index of the first environment of the worker
+        count : int
+            Number of environments of the worker
+        observations : object
+            Shared array of all observations
+        rewards : object
+            Shared array of all rewards
+        dones : object
+            Shared array of all done flags
+        actions : object
+            Shared array of all actions
+        options : dict
+            Keyword arguments of ArkanoidEnv
+    '''
+
+    shape, dtype = ArkanoidEnv.observation_shape(
+        options.pop('cells'), options.get('observation', 'features')
+    )
+    observations = np.frombuffer(observations, dtype=dtype)\
+        .reshape((-1,) + shape)
+    rewards = np.frombuffer(rewards, dtype=np.float32)
+    dones = np.frombuffer(dones, dtype=np.uint8)
+    actions = np.frombuffer(actions, dtype=np.uint8)
+
+    envs = [
+        ArkanoidEnv(observation_buffer=observations[index], **options)
+        for index in range(start, start + count)
+    ]
+
+    try:
+        while True:
+            command, seed = connection.recv()
+
+            if command == 'reset':
+                for offset, env in enumerate(envs):
+                    env.reset(None if seed is None else seed + start + offset)
+                connection.send(None)
+
+            elif command == 'step':
+                finished = []
+                for offset, env in enumerate(envs):
+                    index = start + offset
+                    _, reward, done, info = env.step(actions[index])
+                    rewards[index] = reward
+                    dones[index] = done
+
+                    # Finished environments start over at once
+                    if done:
+                        finished.append((index, info['score'], info['ticks']))
+                        env.reset()
+                connection.send(finished)
+
+            elif command == 'close':
+                break
+    except KeyboardInterrupt:
+        pass
+    finally:
+        connection.close()
+
+
+class VectorEnv:
+    '''Runs many environments in worker processes. Every worker steps
+    its own slice of environments and writes their observations into
+    shared memory, so the parent reads them without copying or
+    pickling.
+
+    Attributes
+    ----------
+        count : int
+            Number of environments
+        workers : int
+            Number of worker processes, by default the number of CPUs
+        seed : int
+            Seed of the environments, environment i gets seed + i
+        options : dict
+            Keyword arguments of ArkanoidEnv
+    '''
+
+    def __init__(self, count, workers=None, seed=None, **options):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = max(min(workers, count), 1)
+
+        self.count = count
+        self.seed = seed
+
+        options.setdefault('levels', DEFAULT_LEVELS)
+        options['cells'] = board_cells(get_level_store(options['levels']))
+        shape, dtype = ArkanoidEnv.observation_shape(
+            options['cells'], options.get('observation', 'features')
+        )
+
+        # Lock-free shared arrays, every slot has a single writer
+        size = count * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        shared_observations = multiprocessing.RawArray('B', size)
+        shared_rewards = multiprocessing.RawArray('B', count * 4)
+        shared_dones = multiprocessing.RawArray('B', count)
+        shared_actions = multiprocessing.RawArray('B', count)
+
+        self.observations = np.frombuffer(shared_observations, dtype=dtype)\
+            .reshape((count,) + shape)
+        self.rewards = np.frombuffer(shared_rewards, dtype=np.float32)
+        self.dones = np.frombuffer(shared_dones, dtype=np.uint8)
+        self.actions = np.frombuffer(shared_actions, dtype=np.uint8)
+
+        # Environments are split evenly between workers
+        self.connections = []
+        self.processes = []
+        for worker in range(workers):
+            start = count * worker // workers
+            stop = count * (worker+1) // workers
+
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=run_worker,
+                args=(
+                    child, start, stop - start, shared_observations,
+                    shared_rewards, shared_dones, shared_actions,
+                    dict(options)
+                ),
+                daemon=True
+            )
+            process.start()
+            child.close()
+
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.finished = []
+
+    def reset(self):
+        '''Starts new episodes in all environments.
+
+        Returns
+        -------
+            observations : array
+                The first observations, one row per environment
+        '''
+
+        for connection in self.connections:
+            connection.send(('reset', self.seed))
+        for connection in self.connections:
+            connection.recv()
+
+        return self.observations
+
+    def step(self, actions):
+        '''Steps all environments in parallel. Environments whose
+        episodes end are reset and return the first observation of the
+        next episode.
+
+        Parameters
+        ----------
+            actions : array
+                Action of every environment
+
+        Returns
+        -------
+            observations : array
+                Observations after the step, a view of shared memory
+                overwritten by the next step
+            rewards : array
+                Reward of every environment
+            dones : array
+                True for environments whose episodes ended
+        '''
+
+        self.actions[:] = actions
+
+        for connection in self.connections:
+            connection.send(('step', None))
+
+        self.finished = []
+        for connection in self.connections:
+            self.finished.extend(connection.recv())
+
+        return self.observations, self.rewards, self.dones.view(np.bool_)
+
+    def close(self):
+        '''Stops the worker processes'''
+
+        for connection in self.connections:
+            try:
+                connection.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+            connection.close()
+
+        for process in self.processes:
+            process.join()
+
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Steps many environments with random actions and '
+        'measures throughput'
+    )
+    parser.add_argument(
+        '--envs', type=int, default=16, help='number of environments'
+    )
+    parser.add_argument(
+        '--workers', type=int, default=None,
+        help='number of worker processes, by default the number of CPUs'
+    )
+    parser.add_argument(
+        '--steps', type=int, default=1000, help='steps of every environment'
+    )
+    parser.add_argument(
+        '--observation', choices=('features', 'pixels'), default='features',
+        help='kind of observations'
+    )
+    parser.add_argument(
+        '--levels',
+        default=DEFAULT_LEVELS,
+        help='path to the levels file'
+    )
+    parser.add_argument('--seed', type=int, default=0, help='random seed')
+    args = parser.parse_args()
+
+    generator = np.random.default_rng(args.seed)
+    episodes = []
+
+    with VectorEnv(
+        args.envs, args.workers, seed=args.seed,
+        levels=args.levels, observation=args.observation
+    ) as envs:
+        envs.reset()
+
+        start = time.perf_counter()
+        for _ in range(args.steps):
+            envs.step(generator.integers(0, 3, args.envs))
+            episodes.extend(envs.finished)
+        seconds = time.perf_counter() - start
+
+        workers = len(envs.processes)
+
+    steps = args.envs * args.steps
+    print(
+        f'{steps} steps of {args.envs} environments in {workers} '
+        f'workers in {seconds:.2f} s ({steps / max(seconds, 1e-9):.0f} '
+        'steps/s)'
+    )
+    if episodes:
+        scores = [score for _, score, _ in episodes]
+        print(
+            f'{len(episodes)} episodes finished, mean score '
+            f'{sum(scores) / len(scores):.0f}'
+        )
+
+
+if __name__ == '__main__':
+    main()
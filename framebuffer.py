@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from level_store import DEFAULT_LEVELS
+from power_ups import COLORS
+from power_ups import SHOT_COLOR
+from replay import Recording
+from replay import recorded_levels
+from replay import replay
+from sprites import get_sprite_cache
+
+
+class Sprite:
+    '''Picture prepared for alpha blending. Transparent borders are cut
+    off and colors are premultiplied by alpha.
+
+    Attributes
+    ----------
+        image : object
+            PIL image object
+    '''
+
+    def __init__(self, image):
+        image = image.convert('RGBA')
+
+        # Offset of the cut picture from the center of the whole one
+        left, top, right, bottom = image.getbbox() or (0, 0, 1, 1)
+        self.offset_x = left - image.width/2
+        self.offset_y = top - image.height/2
+
+        pixels = np.asarray(image.crop((left, top, right, bottom)))
+        alpha = pixels[:, :, 3:].astype(np.uint16)
+        self.premultiplied = pixels[:, :, :3].astype(np.uint16) * alpha
+        self.inverse_alpha = 255 - alpha
+        self.height, self.width = pixels.shape[:2]
+
+
+def parse_color(color):
+    '''Returns RGB bytes of a color like "#324851"'''
+
+    return np.array(
+        [int(color[i:i+2], 16) for i in (1, 3, 5)], dtype=np.uint8
+    )
+
+
+class FrameRenderer:
+    '''Draws the game into a preallocated RGB buffer without a display.
+    The background with the blocks is kept in a second buffer. Every
+    frame only rectangles of the moved objects and of the hit blocks
+    are redrawn.
+
+    Attributes
+    ----------
+        engine : object
+            GameEngine object to draw
+        pics_dir : str
+            Path to the directory with game\'s pictures
+        background : str
+            Color of the playground like "#324851"
+        buffer : array
+            Array of height x width x 3 bytes to draw into, e.g. in
+            shared memory, or None to allocate one
+    '''
+
+    def __init__(self, engine, pics_dir, background='#324851', buffer=None):
+        self.engine = engine
+        self.images = get_sprite_cache(pics_dir)
+        self.color = parse_color(background)
+        self.item_colors = {
+            kind: parse_color(color) for kind, color in COLORS.items()
+        }
+        self.shot_color = parse_color(SHOT_COLOR)
+
+        width = int(engine.width)
+        height = int(engine.height)
+        if buffer is None:
+            buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.buffer = buffer
+        self.background = np.empty_like(self.buffer)
+        self.buffer[:] = self.color
+        self.background[:] = self.color
+
+        self.sprites = {}
+        self.drawn_blocks = None
+        self.drawn_alive = None
+        self.block_rects = {}
+        self.drawn_rects = []
+        self.dirty = []
+
+    def sprite(self, name, scale=None):
+        '''Returns prepared picture.
+
+        Parameters
+        ----------
+            name : str
+                Name of a picture without extension, e.g. "ball"
+            scale : tuple
+                Horizontal and vertical scale of the picture, or None
+                to keep its size
+        '''
+
+        key = name if scale is None else (name, scale)
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            image = self.images.image(name)
+            if scale is not None:
+                image = image.resize((
+                    max(round(image.width * scale[0]), 1),
+                    max(round(image.height * scale[1]), 1)
+                ))
+            sprite = Sprite(image)
+            self.sprites[key] = sprite
+
+        return sprite
+
+    def blit(self, target, sprite, x, y, clip=None):
+        '''Blends a picture centered at x,y into a buffer.
+
+        Parameters
+        ----------
+            target : array
+                Buffer to draw into
+            sprite : object
+                Sprite object
+            x : float
+                X coordinate of picture\'s center
+            y : float
+                Y coordinate of picture\'s center
+            clip : tuple
+                Left, top, right and bottom of the only part of the
+                buffer to draw into, or None to draw anywhere
+
+        Returns
+        -------
+            rect : tuple
+                Left, top, right and bottom of the drawn pixels, or
+                None if the picture is off the buffer
+        '''
+
+        left = int(round(x + sprite.offset_x))
+        top = int(round(y + sprite.offset_y))
+        height, width = target.shape[:2]
+        bounds = clip or (0, 0, width, height)
+
+        # Clips the picture to the buffer
+        clip_left = max(left, bounds[0])
+        clip_top = max(top, bounds[1])
+        clip_right = min(left + sprite.width, bounds[2])
+        clip_bottom = min(top + sprite.height, bounds[3])
+        if clip_right <= clip_left or clip_bottom <= clip_top:
+            return None
+
+        rows = slice(clip_top - top, clip_bottom - top)
+        columns = slice(clip_left - left, clip_right - left)
+        region = target[clip_top:clip_bottom, clip_left:clip_right]
+
+        region[:] = (
+            sprite.premultiplied[rows, columns]
+            + region * sprite.inverse_alpha[rows, columns]
+            + 127
+        ) // 255
+
+        return (clip_left, clip_top, clip_right, clip_bottom)
+
+    def fill(self, target, color, x, y, width, height):
+        '''Fills a rectangle centered at x,y with a color.
+
+        Parameters
+        ----------
+            target : array
+                Buffer to draw into
+            color : array
+                RGB bytes of the color
+            x : float
+                X coordinate of rectangle\'s center
+            y : float
+                Y coordinate of rectangle\'s center
+            width : float
+                Width of the rectangle
+            height : float
+                Height of the rectangle
+
+        Returns
+        -------
+            rect : tuple
+                Left, top, right and bottom of the drawn pixels, or
+                None if the rectangle is off the buffer
+        '''
+
+        buffer_height, buffer_width = target.shape[:2]
+        left = max(int(round(x - width/2)), 0)
+        top = max(int(round(y - height/2)), 0)
+        right = min(int(round(x + width/2)), buffer_width)
+        bottom = min(int(round(y + height/2)), buffer_height)
+        if right <= left or bottom <= top:
+            return None
+
+        target[top:bottom, left:right] = color
+
+        return (left, top, right, bottom)
+
+    def block_scale(self):
+        '''Returns scale of blocks\' pictures like ArkanoidGame.draw_blocks'''
+
+        engine = self.engine
+        blocks = engine.blocks
+        if blocks.cell_width == engine.max_block_width\
+                and blocks.cell_height == engine.max_block_height:
+            return None
+
+        return (
+            blocks.cell_width / engine.max_block_width,
+            blocks.cell_height / engine.max_block_height
+        )
+
+    def draw_blocks(self):
+        '''Draws all blocks of the current level into the background'''
+
+        blocks = self.engine.blocks
+        scale = self.block_scale()
+
+        self.background[:] = self.color
+        self.block_rects = {}
+        for block in blocks:
+            rect = self.blit(
+                self.background,
+                self.sprite('block_' + str(blocks.variants[block]), scale),
+                blocks.xs[block], blocks.ys[block]
+            )
+            if rect:
+                self.block_rects[block] = rect
+
+        self.drawn_blocks = blocks
+        self.drawn_alive = bytes(blocks.alive)
+        self.buffer[:] = self.background
+        self.drawn_rects = []
+        self.dirty.append((0, 0, self.buffer.shape[1], self.buffer.shape[0]))
+
+    def erase_blocks(self):
+        '''Erases blocks hit since the last frame from the background'''
+
+        blocks = self.engine.blocks
+        alive = bytes(blocks.alive)
+        if alive == self.drawn_alive:
+            return
+
+        # Bits that were set and are cleared now
+        changed = np.frombuffer(self.drawn_alive, dtype=np.uint8)\
+            & ~np.frombuffer(alive, dtype=np.uint8)
+        removed = np.flatnonzero(np.unpackbits(changed, bitorder='little'))
+        self.drawn_alive = alive
+
+        scale = self.block_scale()
+
+        # Pictures are a bit bigger than cells
+        sprite = self.sprite('block_1', scale)
+        margin_x = max(sprite.width - blocks.cell_width, 0)/2 + 1
+        margin_y = max(sprite.height - blocks.cell_height, 0)/2 + 1
+
+        for block in removed.tolist():
+            rect = self.block_rects.pop(block, None)
+            if rect is None:
+                continue
+
+            left, top, right, bottom = rect
+            self.background[top:bottom, left:right] = self.color
+
+            # Pictures of neighbours can overlap the erased one. They are
+            # placed like in draw_blocks and clipped, because rounding of
+            # shifted coordinates could move them by a pixel.
+            neighbours = blocks.query(
+                left - margin_x, top - margin_y,
+                right + margin_x, bottom + margin_y
+            )
+            for neighbour in neighbours:
+                self.blit(
+                    self.background,
+                    self.sprite(
+                        'block_' + str(blocks.variants[neighbour]), scale
+                    ),
+                    blocks.xs[neighbour], blocks.ys[neighbour], rect
+                )
+
+            self.buffer[top:bottom, left:right] = \
+                self.background[top:bottom, left:right]
+            self.dirty.append(rect)
+
+    def render(self, alpha=1):
+        '''Draws a frame.
+
+        Parameters
+        ----------
+            alpha : float
+                Part of a tick passed since the current tick, the balls
+                are drawn between the last two ticks
+
+        Returns
+        -------
+            dirty : list
+                Left, top, right and bottom of every changed rectangle
+        '''
+
+        engine = self.engine
+        self.dirty = []
+
+        if engine.blocks is not self.drawn_blocks:
+            self.draw_blocks()
+        else:
+            self.erase_blocks()
+
+        # Erases moving objects
+        buffer = self.buffer
+        for left, top, right, bottom in self.drawn_rects:
+            buffer[top:bottom, left:right] = \
+                self.background[top:bottom, left:right]
+        self.dirty.extend(self.drawn_rects)
+
+        # Draws them at new positions
+        drawn = []
+        platform = engine.platform
+        scale = None
+        if engine.platform_width != engine.normal_platform_width:
+            scale = (engine.platform_width / engine.normal_platform_width, 1)
+        drawn.append(self.blit(
+            buffer, self.sprite('platform', scale), platform.x, platform.y
+        ))
+
+        items = engine.items
+        for index in range(items.count):
+            drawn.append(self.fill(
+                buffer, self.item_colors[items.kinds[index]],
+                items.xs[index], items.ys[index],
+                engine.item_width, engine.item_height
+            ))
+
+        shots = engine.shots
+        for index in range(shots.count):
+            drawn.append(self.fill(
+                buffer, self.shot_color, shots.xs[index], shots.ys[index],
+                engine.shot_width, engine.shot_height
+            ))
+
+        ball = self.sprite('ball')
+        for each in engine.balls:
+            x, y = each.interpolate(alpha)
+            drawn.append(self.blit(buffer, ball, x, y))
+
+        self.drawn_rects = [rect for rect in drawn if rect]
+        self.dirty.extend(self.drawn_rects)
+
+        return self.dirty
+
+    def frame(self):
+        '''Returns the last drawn frame without copying it.
+
+        Returns
+        -------
+            frame : memoryview
+                Rows of RGB pixels, shape is height, width, 3
+        '''
+
+        return memoryview(self.buffer)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replays a recorded game headless and writes its '
+        'frames as raw RGB video'
+    )
+    parser.add_argument('recording', help='path to a recording')
+    parser.add_argument(
+        '--levels',
+        default=DEFAULT_LEVELS,
+        help='path to the levels file the game was played with, '
+        'ignored for endless games'
+    )
+    parser.add_argument(
+        '--frame-rate', type=int, default=60, help='frames per second'
+    )
+    parser.add_argument(
+        '--output',
+        default='-',
+        help='path to the raw RGB file, "-" writes to standard output'
+    )
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+    pics_dir = os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), 'pics'
+    )
+    ticks_per_frame = max(recording.tick_rate // args.frame_rate, 1)
+
+    if args.output == '-':
+        output = sys.stdout.buffer
+    else:
+        output = open(args.output, 'wb')
+
+    renderers = []
+    frames = 0
+
+    def on_tick(engine):
+        nonlocal frames
+
+        if not renderers:
+            renderers.append(FrameRenderer(engine, pics_dir))
+
+        if engine.ticks % ticks_per_frame == 0:
+            renderers[0].render()
+            output.write(renderers[0].frame())
+            frames += 1
+
+    start = time.perf_counter()
+    engine = replay(
+        recording, recorded_levels(recording, args.levels), on_tick=on_tick
+    )
+    seconds = time.perf_counter() - start
+
+    if output is not sys.stdout.buffer:
+        output.close()
+
+    print(
+        f'Rendered {frames} frames of {int(engine.width)}x'
+        f'{int(engine.height)} in {seconds:.2f} s '
+        f'({frames / max(seconds, 1e-9):.0f} frames/s)',
+        file=sys.stderr
+    )
+
+
+if __name__ == '__main__':
+    main()
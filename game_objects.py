@@ -1,7 +1,5 @@
 #!/usr/bin/env python3
 
-import sys
-
 
 class Ball:
     '''Game\'s ball object that moves in all directions.
@@ -14,44 +12,52 @@ class Ball:
             X coordinate of a ball\'s image
         y : float
             Y coordinate of a ball\'s image
+        movement_speed : float
+            Distance the ball moves in one tick
     '''
 
-    def __init__(self, image, x, y):
+    def __init__(self, image, x, y, movement_speed=6):
         self.image = image
         self.x = x
         self.y = y
+        self.previous_x = x
+        self.previous_y = y
         self.x_direction = 1
         self.y_direction = -1
+        self.movement_speed = movement_speed
 
-        if sys.platform == 'linux':
-            self.movement_speed = 6
-        else:
-            self.movement_speed = 1
-    
-    def move(self):
-        '''Moves ball in a given direction'''
+    def remember_position(self):
+        '''Keeps current position as the one of the previous tick'''
 
-        self.x += self.movement_speed * self.x_direction
-        self.y += self.movement_speed * self.y_direction
+        self.previous_x = self.x
+        self.previous_y = self.y
 
+    def interpolate(self, alpha):
+        '''Returns ball\'s position between the previous and the current
+        tick.
 
-class Block:
-    '''Game\'s block object that must be hit by the ball.
-    
-    Attributes
-    ----------
-        image : object
-            Image of a block as a PIL object
-        x : float
-            X coordinate of a block\'s image
-        y : float
-            Y coordinate of a block\'s image
-    '''
+        Parameters
+        ----------
+            alpha : float
+                Part of a tick passed since the current tick
+        '''
 
-    def __init__(self, image, x, y):
-        self.image = image
-        self.x = x
-        self.y = y
+        return (
+            self.previous_x + (self.x - self.previous_x) * alpha,
+            self.previous_y + (self.y - self.previous_y) * alpha
+        )
+
+    def move(self, time=1):
+        '''Moves ball in a given direction.
+
+        Parameters
+        ----------
+            time : float
+                Part of a tick to move for
+        '''
+
+        self.x += self.movement_speed * self.x_direction * time
+        self.y += self.movement_speed * self.y_direction * time
 
 
 class Platform:
@@ -71,4 +77,4 @@ class Platform:
     def __init__(self, image, x, y):
         self.image = image
         self.x = x
-        self.y = y
\ No newline at end of file
+        self.y = y
\ No newline at end of file
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+
+
+class GameState:
+    '''Numbers the player sees in the info bar. They are plain Python
+    integers, so the game logic never talks to the Tcl interpreter.
+
+    Attributes
+    ----------
+        score : int
+            Points for hit blocks
+        lives : int
+            Lives left
+        level : int
+            Number of the current level
+        combo : int
+            Blocks hit since the ball last touched the platform
+    '''
+
+    __slots__ = ('score', 'lives', 'level', 'combo')
+
+    fields = __slots__
+
+    def __init__(self, score=0, lives=3, level=1, combo=0):
+        self.score = score
+        self.lives = lives
+        self.level = level
+        self.combo = combo
+
+    def snapshot(self):
+        '''Returns values of all fields as a tuple'''
+
+        return (self.score, self.lives, self.level, self.combo)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+from random import Random
+
+from level_store import Level
+
+
+def generate_level(seed, number, rows=12, columns=18):
+    '''Generates a level. Blocks are mirrored around the vertical axis
+    and later levels are denser. The same seed and number always give
+    the same level, no matter which levels were generated before.
+
+    Parameters
+    ----------
+        seed : int
+            Seed of the levels
+        number : int
+            Number of a level
+        rows : int
+            Number of rows
+        columns : int
+            Number of columns
+
+    Returns
+    -------
+        level : object
+            Level object
+    '''
+
+    random = Random(f'{seed}:{number}')
+
+    # Bottom quarter of the board stays empty, so the ball has room
+    filled_rows = max(rows - rows//4, 1)
+    half = (columns + 1) // 2
+
+    mask = 0
+    for row in range(filled_rows):
+        bits = random.getrandbits(half)
+
+        # A quarter, a half and then three quarters of cells are filled
+        if number == 1:
+            bits &= random.getrandbits(half)
+        elif number > 2:
+            bits |= random.getrandbits(half)
+
+        # Left half is mirrored onto the right one
+        mirrored = int(format(bits, f'0{half}b')[::-1], 2)
+        bits |= mirrored << (columns - half)
+
+        mask |= bits << (row * columns)
+
+    # A level needs at least one block
+    if not mask:
+        mask = 1 << (columns // 2)
+
+    return Level(number, rows, columns, mask)
+
+
+def generate_levels(seed, rows=12, columns=18, start=1):
+    '''Lazily generates an endless sequence of levels.
+
+    Parameters
+    ----------
+        seed : int
+            Seed of the levels
+        rows : int
+            Number of rows
+        columns : int
+            Number of columns
+        start : int
+            Number of the first level
+
+    Returns
+    -------
+        levels : iterator
+            Level objects, one at a time
+    '''
+
+    return (
+        generate_level(seed, number, rows, columns)
+        for number in itertools.count(start)
+    )
+
+
+class ProceduralLevels:
+    '''Levels that are generated when they are played, so an endless
+    game never keeps more than one of them in memory. Can be used
+    instead of a LevelStore by the engines.
+
+    Attributes
+    ----------
+        seed : int
+            Seed of the levels
+        rows : int
+            Number of rows
+        columns : int
+            Number of columns
+        count : int
+            Number of levels, or None for endless levels
+    '''
+
+    def __init__(self, seed, rows=12, columns=18, count=None):
+        self.seed = seed
+        self.rows = rows
+        self.columns = columns
+        self.count = count
+        self.last = None
+
+    def __contains__(self, number):
+        return 1 <= number and (self.count is None or number <= self.count)
+
+    def numbers(self):
+        '''Returns numbers of the levels, only if there are finitely
+        many of them'''
+
+        if self.count is None:
+            raise ValueError('endless levels can\'t be listed')
+
+        return list(range(1, self.count + 1))
+
+    def size(self, number):
+        '''Returns rows,columns of a level without generating it'''
+
+        if number not in self:
+            raise KeyError(number)
+
+        return self.rows, self.columns
+
+    def level(self, number):
+        '''Returns a level.
+
+        Parameters
+        ----------
+            number : int
+                Number of a level
+
+        Returns
+        -------
+            level : object
+                Level object
+        '''
+
+        if number not in self:
+            raise KeyError(number)
+
+        if self.last is None or self.last.number != number:
+            self.last = generate_level(
+                self.seed, number, self.rows, self.columns
+            )
+
+        return self.last
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Writes generated levels into a levels JSON file'
+    )
+    parser.add_argument('levels', help='path to the levels JSON file')
+    parser.add_argument(
+        '--count', type=int, default=10, help='number of levels'
+    )
+    parser.add_argument('--rows', type=int, default=12, help='number of rows')
+    parser.add_argument(
+        '--columns', type=int, default=18, help='number of columns'
+    )
+    parser.add_argument(
+        '--seed', type=int, default=0, help='seed of the levels'
+    )
+    args = parser.parse_args()
+
+    levels = itertools.islice(
+        generate_levels(args.seed, args.rows, args.columns), args.count
+    )
+    with open(args.levels, 'w') as f:
+        json.dump(
+            {f'level{level.number}': level.matrix() for level in levels}, f
+        )
+    print(f'Generated {args.count} levels into {args.levels}')
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import mmap
+import os
+import re
+import struct
+
+
+# Header of a compiled levels pack: magic, version and number of levels
+PACK_HEADER = struct.Struct('<4sHI')
+# Index entry of a level: number, rows, columns, offset and size of mask
+PACK_ENTRY = struct.Struct('<IHHII')
+PACK_MAGIC = b'ARKL'
+PACK_VERSION = 1
+
+# Levels the game is played with unless other ones are given
+DEFAULT_LEVELS = os.path.join(
+    os.path.dirname(os.path.realpath(__file__)), 'levels', 'levels.json'
+)
+
+
+class Level:
+    '''Blocks of a level kept as a bitmask. Bit "row*columns + column"
+    is set when there is a block in the cell.
+
+    Attributes
+    ----------
+        number : int
+            Number of a level
+        rows : int
+            Number of rows
+        columns : int
+            Number of columns
+        mask : int
+            Bitmask of blocks
+    '''
+
+    def __init__(self, number, rows, columns, mask):
+        self.number = number
+        self.rows = rows
+        self.columns = columns
+        self.mask = mask
+
+    def __len__(self):
+        return bin(self.mask).count('1')
+
+    def cells(self):
+        '''Iterates over row,column of the blocks row by row'''
+
+        columns = self.columns
+
+        # Bytes of a big mask are walked instead of shifting the integer
+        data = self.mask.to_bytes((self.rows*columns + 7) // 8, 'little')
+        for byte_index, byte in enumerate(data):
+            while byte:
+                lowest = byte & -byte
+                byte ^= lowest
+
+                yield divmod(
+                    byte_index*8 + lowest.bit_length() - 1, columns
+                )
+
+    def matrix(self):
+        '''Returns level as a matrix of "b" and "" like in levels.json'''
+
+        matrix = [[''] * self.columns for _ in range(self.rows)]
+        for row, column in self.cells():
+            matrix[row][column] = 'b'
+
+        return matrix
+
+
+def matrix_to_level(number, matrix):
+    '''Converts a matrix of "b" and "" into a level.
+
+    Parameters
+    ----------
+        number : int
+            Number of a level
+        matrix : list
+            Rows of the level
+
+    Returns
+    -------
+        level : object
+            Level object
+    '''
+
+    rows = len(matrix)
+    columns = len(matrix[0]) if rows else 0
+    if not rows or not columns:
+        raise ValueError(f'level{number} is empty')
+
+    mask = 0
+    for i, row in enumerate(matrix):
+        if len(row) != columns:
+            raise ValueError(
+                f'level{number}: row {i} has {len(row)} cells instead of '
+                f'{columns}'
+            )
+
+        for j, cell in enumerate(row):
+            if cell:
+                mask |= 1 << (i*columns + j)
+
+    return Level(number, rows, columns, mask)
+
+
+class LevelStore:
+    '''Levels pack that is read once. Levels are decoded only when they
+    are played.
+
+    Attributes
+    ----------
+        entries : dict
+            Maps level numbers to already decoded levels or to functions
+            that decode them
+        sizes : dict
+            Maps level numbers to rows,columns of the levels
+    '''
+
+    def __init__(self, entries, sizes):
+        self.entries = entries
+        self.sizes = sizes
+        self.mapped = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, number):
+        return number in self.entries
+
+    def numbers(self):
+        '''Returns sorted numbers of the levels'''
+
+        return sorted(self.entries)
+
+    def size(self, number):
+        '''Returns rows,columns of a level without decoding it'''
+
+        return self.sizes[number]
+
+    def level(self, number):
+        '''Returns a level.
+
+        Parameters
+        ----------
+            number : int
+                Number of a level
+
+        Returns
+        -------
+            level : object
+                Level object
+        '''
+
+        level = self.entries[number]
+        if callable(level):
+            level = level()
+            self.entries[number] = level
+
+        return level
+
+    def close(self):
+        '''Unmaps compiled pack\'s file'''
+
+        if self.mapped is not None:
+            self.entries = {
+                number: self.level(number) for number in self.entries
+            }
+            self.mapped.close()
+            self.mapped = None
+
+    @classmethod
+    def from_levels(cls, levels):
+        '''Creates a store of levels in the levels.json format.
+
+        Parameters
+        ----------
+            levels : dict
+                Maps "levelN" keys to matrices of blocks
+        '''
+
+        entries = {}
+        for key, matrix in levels.items():
+            match = re.fullmatch(r'level(\d+)', key)
+            if not match:
+                raise ValueError(f'"{key}" is not a "levelN" key')
+
+            number = int(match.group(1))
+            entries[number] = matrix_to_level(number, matrix)
+
+        sizes = {
+            number: (level.rows, level.columns)
+            for number, level in entries.items()
+        }
+
+        return cls(entries, sizes)
+
+    @classmethod
+    def from_json(cls, path):
+        '''Creates a store of levels.json file.
+
+        Parameters
+        ----------
+            path : str
+                Path to a levels JSON file
+        '''
+
+        with open(path, 'r') as f:
+            return cls.from_levels(json.load(f))
+
+    @classmethod
+    def from_pack(cls, path):
+        '''Creates a store of compiled levels pack. The file is memory
+        mapped and only its index is read up front.
+
+        Parameters
+        ----------
+            path : str
+                Path to a compiled levels pack
+        '''
+
+        with open(path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, count = PACK_HEADER.unpack_from(mapped, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            mapped.close()
+            raise ValueError(f'{path} is not a levels pack')
+
+        def decoder(number, rows, columns, offset, size):
+            def decode():
+                mask = int.from_bytes(
+                    mapped[offset:offset+size], 'little'
+                )
+                return Level(number, rows, columns, mask)
+
+            return decode
+
+        entries = {}
+        sizes = {}
+        for i in range(count):
+            number, rows, columns, offset, size = PACK_ENTRY.unpack_from(
+                mapped, PACK_HEADER.size + i*PACK_ENTRY.size
+            )
+            if not rows or not columns or len(mapped) < offset + size:
+                mapped.close()
+                raise ValueError(f'{path}: level{number} is corrupted')
+
+            entries[number] = decoder(number, rows, columns, offset, size)
+            sizes[number] = (rows, columns)
+
+        store = cls(entries, sizes)
+        store.mapped = mapped
+
+        return store
+
+    @classmethod
+    def open(cls, path):
+        '''Creates a store of levels JSON file or of compiled pack.
+
+        Parameters
+        ----------
+            path : str
+                Path to a levels file
+        '''
+
+        if path.endswith('.json'):
+            return cls.from_json(path)
+
+        return cls.from_pack(path)
+
+    def save_pack(self, path):
+        '''Writes levels into a compiled pack.
+
+        Parameters
+        ----------
+            path : str
+                Path to a compiled levels pack
+        '''
+
+        numbers = self.numbers()
+        offset = PACK_HEADER.size + len(numbers)*PACK_ENTRY.size
+
+        index = []
+        data = []
+        for number in numbers:
+            level = self.level(number)
+            size = (level.rows*level.columns + 7) // 8
+            index.append(PACK_ENTRY.pack(
+                number, level.rows, level.columns, offset, size
+            ))
+            data.append(level.mask.to_bytes(size, 'little'))
+            offset += size
+
+        with open(path, 'wb') as f:
+            f.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(numbers)))
+            f.writelines(index)
+            f.writelines(data)
+
+
+_stores = {}
+
+
+def get_level_store(path):
+    '''Returns the process-wide store of a levels file.
+
+    Parameters
+    ----------
+        path : str
+            Path to a levels JSON file or to a compiled pack
+    '''
+
+    path = os.path.realpath(path)
+    store = _stores.get(path)
+    if store is None:
+        store = LevelStore.open(path)
+        _stores[path] = store
+
+    return store
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description='Compiles levels JSON file into a levels pack'
+    )
+    parser.add_argument('levels', help='path to a levels JSON file')
+    parser.add_argument('pack', help='path to the compiled pack')
+    args = parser.parse_args()
+
+    store = LevelStore.from_json(args.levels)
+    store.save_pack(args.pack)
+    print(f'Compiled {len(store)} levels into {args.pack}')
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+
+from array import array
+import math
+from random import Random
+import time
+
+
+class ParticleSystem:
+    '''Short-lived sparks kept in preallocated typed arrays. Active
+    particles are the first count slots and a dead particle is replaced
+    by the last one, like power_ups.ItemPool.
+
+    The time spent on particles every frame is kept within a budget.
+    When a frame runs over it, the limit of particles shrinks and the
+    particles over the limit are dropped, so effects get thinner
+    instead of frames getting slower. The limit grows back while frames
+    stay well within the budget.
+
+    Attributes
+    ----------
+        capacity : int
+            Number of preallocated particles
+        budget : float
+            Seconds a frame may spend on particles
+        timer : function
+            Function that returns current time in seconds
+        seed : int
+            Seed of particles\' directions and speeds
+    '''
+
+    def __init__(self, capacity=512, budget=0.002, timer=time.perf_counter,
+            seed=None):
+        self.capacity = capacity
+        self.budget = budget
+        self.timer = timer
+        self.random = Random(seed)
+
+        self.xs = array('d', bytes(8 * capacity))
+        self.ys = array('d', bytes(8 * capacity))
+        self.x_speeds = array('d', bytes(8 * capacity))
+        self.y_speeds = array('d', bytes(8 * capacity))
+        self.ages = array('d', bytes(8 * capacity))
+        self.lifetimes = array('d', bytes(8 * capacity))
+        self.colors = [None] * capacity
+        self.count = 0
+
+        # Pixels per second squared
+        self.gravity = 900
+        # Width and height of a particle
+        self.size = 4
+
+        # Adapted to the budget, never below min_limit
+        self.limit = capacity
+        self.min_limit = 16
+        self.last_cost = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return self.count
+
+    def emit(self, x, y, count, color, speed=200, lifetime=0.5):
+        '''Adds a burst of particles flying apart from a point, as many
+        as the limit allows.
+
+        Parameters
+        ----------
+            x : float
+                X coordinate of the burst
+            y : float
+                Y coordinate of the burst
+            count : int
+                Number of wanted particles
+            color : str
+                Color of the particles like "#ffffff"
+            speed : float
+                Maximal speed of particles in pixels per second
+            lifetime : float
+                Maximal lifetime of particles in seconds
+
+        Returns
+        -------
+            emitted : int
+                Number of actually added particles
+        '''
+
+        emitted = max(min(count, self.limit - self.count), 0)
+        self.dropped += count - emitted
+
+        random = self.random
+        for index in range(self.count, self.count + emitted):
+            angle = random.uniform(0, 2*math.pi)
+            particle_speed = speed * random.uniform(0.3, 1)
+
+            self.xs[index] = x
+            self.ys[index] = y
+            self.x_speeds[index] = particle_speed * math.cos(angle)
+            self.y_speeds[index] = particle_speed * math.sin(angle)
+            self.ages[index] = 0
+            self.lifetimes[index] = lifetime * random.uniform(0.5, 1)
+            self.colors[index] = color
+
+        self.count += emitted
+
+        return emitted
+
+    def update(self, seconds):
+        '''Moves all particles in one pass and removes dead ones.
+
+        Parameters
+        ----------
+            seconds : float
+                Time passed since the last update
+        '''
+
+        xs, ys = self.xs, self.ys
+        x_speeds, y_speeds = self.x_speeds, self.y_speeds
+        ages, lifetimes = self.ages, self.lifetimes
+        fall = self.gravity * seconds
+
+        for index in range(self.count-1, -1, -1):
+            age = ages[index] + seconds
+            if age >= lifetimes[index]:
+                self.remove(index)
+                continue
+
+            ages[index] = age
+            y_speeds[index] += fall
+            xs[index] += x_speeds[index] * seconds
+            ys[index] += y_speeds[index] * seconds
+
+    def remove(self, index):
+        '''Removes a particle by moving the last one into its slot.
+
+        Parameters
+        ----------
+            index : int
+                Slot of the particle
+        '''
+
+        last = self.count - 1
+        self.xs[index] = self.xs[last]
+        self.ys[index] = self.ys[last]
+        self.x_speeds[index] = self.x_speeds[last]
+        self.y_speeds[index] = self.y_speeds[last]
+        self.ages[index] = self.ages[last]
+        self.lifetimes[index] = self.lifetimes[last]
+        self.colors[index] = self.colors[last]
+        self.count = last
+
+    def truncate(self, count):
+        '''Drops particles from the slot count on.
+
+        Parameters
+        ----------
+            count : int
+                Number of kept particles
+        '''
+
+        if count < self.count:
+            self.dropped += self.count - count
+            self.count = count
+
+    def adapt(self, cost):
+        '''Adapts the limit of particles to the time the last frame
+        spent on them.
+
+        Parameters
+        ----------
+            cost : float
+                Seconds spent on particles in the last frame
+        '''
+
+        self.last_cost = cost
+
+        if cost > self.budget:
+            # Shrinks in proportion to the overrun
+            self.limit = max(
+                int(self.limit * self.budget / cost), self.min_limit
+            )
+            self.truncate(self.limit)
+        elif cost < self.budget/2 and self.limit < self.capacity:
+            self.limit = min(
+                self.limit + self.capacity//16, self.capacity
+            )
+
+    def over_budget(self, start):
+        '''Checks whether the frame has spent its budget.
+
+        Parameters
+        ----------
+            start : float
+                Time the frame started to work on particles
+        '''
+
+        return self.timer() - start > self.budget
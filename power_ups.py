@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+from array import array
+
+
+# Kinds of power-ups
+WIDER = 1
+SLOW = 2
+MULTI_BALL = 3
+LASER = 4
+KINDS = (WIDER, SLOW, MULTI_BALL, LASER)
+
+# Colors power-ups and laser shots are drawn with
+COLORS = {
+    WIDER: '#59a3c2',
+    SLOW: '#f2c94c',
+    MULTI_BALL: '#6fcf97',
+    LASER: '#eb5757'
+}
+SHOT_COLOR = '#ffffff'
+
+
+class ItemPool:
+    '''Falling power-ups or flying laser shots kept in preallocated
+    typed arrays. Active items are the first count slots, so a tick
+    updates all of them in one pass. A removed item is replaced by the
+    last one, and no memory is allocated after the pool is created.
+
+    Attributes
+    ----------
+        capacity : int
+            Maximal number of active items, new items are rejected
+            when the pool is full
+    '''
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.xs = array('d', bytes(8 * capacity))
+        self.ys = array('d', bytes(8 * capacity))
+        self.kinds = array('B', bytes(capacity))
+        self.count = 0
+
+        # Items that didn\'t fit into the pool
+        self.rejected = 0
+
+    def __len__(self):
+        return self.count
+
+    def spawn(self, x, y, kind=0):
+        '''Activates an item.
+
+        Parameters
+        ----------
+            x : float
+                X coordinate of item\'s center
+            y : float
+                Y coordinate of item\'s center
+            kind : int
+                Kind of the item, e.g. WIDER
+
+        Returns
+        -------
+            spawned : bool
+                False if the pool is full
+        '''
+
+        index = self.count
+        if index == self.capacity:
+            self.rejected += 1
+            return False
+
+        self.xs[index] = x
+        self.ys[index] = y
+        self.kinds[index] = kind
+        self.count = index + 1
+
+        return True
+
+    def remove(self, index):
+        '''Deactivates an item by moving the last active item into its
+        slot. Items after the index keep their slots, so a pool can be
+        iterated backwards while items are removed.
+
+        Parameters
+        ----------
+            index : int
+                Slot of the item
+        '''
+
+        last = self.count - 1
+        self.xs[index] = self.xs[last]
+        self.ys[index] = self.ys[last]
+        self.kinds[index] = self.kinds[last]
+        self.count = last
+
+    def clear(self):
+        '''Deactivates all items'''
+
+        self.count = 0
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+from array import array
+import csv
+import json
+import time
+
+
+class FrameProfiler:
+    '''Records how long every phase of a frame takes and how long player's
+    inputs wait until they are drawn. Only the last frames and inputs
+    are kept in ring buffers of fixed size, so recording never allocates
+    memory.
+
+    Attributes
+    ----------
+        size : int
+            Number of kept frames
+        timer : function
+            Function that returns current time in seconds
+    '''
+
+    phases = ('simulation', 'render', 'flush')
+
+    def __init__(self, size=1024, timer=time.perf_counter):
+        self.size = size
+        self.timer = timer
+
+        self.starts = array('d', bytes(8 * size))
+        self.durations = {
+            phase: array('d', bytes(8 * size)) for phase in self.phases
+        }
+        self.ticks = array('d', bytes(8 * size))
+        self.index = 0
+        self.count = 0
+        self.last_time = 0
+
+        # Time from an input event to the flush that draws it
+        self.latencies = array('d', bytes(8 * size))
+        self.latency_index = 0
+        self.latency_count = 0
+
+    def begin_frame(self):
+        '''Starts measuring a frame'''
+
+        now = self.timer()
+        self.starts[self.index] = now
+        self.last_time = now
+
+        # Phases that are skipped in the frame stay zero
+        for durations in self.durations.values():
+            durations[self.index] = 0
+
+    def mark(self, phase):
+        '''Records the time passed since the previous mark as a phase.
+
+        Parameters
+        ----------
+            phase : str
+                Name of the phase, one of FrameProfiler.phases
+        '''
+
+        now = self.timer()
+        self.durations[phase][self.index] = now - self.last_time
+        self.last_time = now
+
+    def end_frame(self, ticks=0):
+        '''Finishes measuring a frame.
+
+        Parameters
+        ----------
+            ticks : int
+                Number of simulation ticks in the frame
+        '''
+
+        self.ticks[self.index] = ticks
+        self.index = (self.index + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def record_latency(self, seconds):
+        '''Records how long an input waited until it was drawn.
+
+        Parameters
+        ----------
+            seconds : float
+                Time between the input event and the canvas flush
+        '''
+
+        self.latencies[self.latency_index] = seconds
+        self.latency_index = (self.latency_index + 1) % self.size
+        self.latency_count = min(self.latency_count + 1, self.size)
+
+    def frames(self):
+        '''Returns recorded frames from the oldest one.
+
+        Returns
+        -------
+            frames : list
+                Dicts of frame\'s start time, number of ticks, durations
+                of the phases and time spent in tkinter until the next
+                frame, all in seconds
+        '''
+
+        first = (self.index - self.count) % self.size
+        order = [(first + i) % self.size for i in range(self.count)]
+
+        frames = []
+        for position, i in enumerate(order):
+            frame = {'start': self.starts[i], 'ticks': int(self.ticks[i])}
+            for phase in self.phases:
+                frame[phase] = self.durations[phase][i]
+
+            # Time between the end of the frame and the next one
+            if position + 1 < len(order):
+                work = sum(frame[phase] for phase in self.phases)
+                frame['tk'] = self.starts[order[position+1]]\
+                    - frame['start'] - work
+            else:
+                frame['tk'] = 0
+
+            frames.append(frame)
+
+        return frames
+
+    def fps(self):
+        '''Returns number of frames per second of the recorded frames'''
+
+        if self.count < 2:
+            return 0
+
+        newest = self.starts[(self.index - 1) % self.size]
+        oldest = self.starts[(self.index - self.count) % self.size]
+        if newest <= oldest:
+            return 0
+
+        return (self.count - 1) / (newest - oldest)
+
+    def percentile(self, phase, percent):
+        '''Returns a percentile of a phase\'s duration.
+
+        Parameters
+        ----------
+            phase : str
+                Name of the phase, or 'input' for inputs' latency
+            percent : float
+                Percentile between 0 and 100
+        '''
+
+        if phase == 'input':
+            durations = self.latencies
+            index, count = self.latency_index, self.latency_count
+        else:
+            durations = self.durations[phase]
+            index, count = self.index, self.count
+
+        if not count:
+            return 0
+
+        first = (index - count) % self.size
+        values = sorted(
+            durations[(first + i) % self.size] for i in range(count)
+        )
+
+        return values[min(int(len(values) * percent / 100), len(values)-1)]
+
+    def summary(self):
+        '''Returns frames per second and 50th/99th percentiles of every
+        phase and of inputs' latency in milliseconds'''
+
+        summary = {'frames': self.count, 'fps': self.fps()}
+        for phase in (*self.phases, 'input'):
+            summary[phase] = {
+                'p50': self.percentile(phase, 50) * 1e3,
+                'p99': self.percentile(phase, 99) * 1e3
+            }
+
+        return summary
+
+    def dump(self, path):
+        '''Writes recorded frames into a CSV or a JSON file, depending on
+        file\'s extension.
+
+        Parameters
+        ----------
+            path : str
+                Path to the file
+        '''
+
+        frames = self.frames()
+
+        if path.endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump(
+                    {'summary': self.summary(), 'frames': frames},
+                    f,
+                    indent=4
+                )
+            return
+
+        with open(path, 'w', newline='') as f:
+            fields = ['start', 'ticks', *self.phases, 'tk']
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(frames)
+
+
+class StartupTimer:
+    '''Records when stages of the startup end.
+
+    Attributes
+    ----------
+        start : float
+            Time the startup began at
+        timer : function
+            Function that returns current time in seconds
+    '''
+
+    def __init__(self, start, timer=time.perf_counter):
+        self.start = start
+        self.timer = timer
+        self.stages = []
+
+    def mark(self, stage, now=None):
+        '''Records the end of a stage.
+
+        Parameters
+        ----------
+            stage : str
+                Name of the stage
+            now : float
+                Time the stage ended at, current time if omitted
+        '''
+
+        if now is None:
+            now = self.timer()
+        self.stages.append((stage, now - self.start))
+
+    def report(self, file=None):
+        '''Prints time from the start to the end of every stage and the
+        duration of the stage in milliseconds'''
+
+        previous = 0
+        for stage, seconds in self.stages:
+            print(
+                f'{stage:<16} {seconds * 1e3:>8.1f} ms '
+                f'(+{(seconds - previous) * 1e3:.1f} ms)',
+                file=file
+            )
+            previous = seconds
@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+
+import argparse
+from array import array
+import hashlib
+import struct
+import sys
+import time
+
+from engine import GameEngine
+from level_generator import ProceduralLevels
+from level_store import DEFAULT_LEVELS
+from level_store import get_level_store
+
+
+# Header of a recording: magic, version, seed, tick rate, width and
+# height of the playground, number of inputs, whether power-ups drop and
+# rows and columns of endless generated levels, 0 for a levels file
+HEADER = struct.Struct('<4sHQIddI?II')
+# Recordings of the second version have no board of generated levels
+HEADER_V2 = struct.Struct('<4sHQIddI?')
+# Recordings of the first version have no power-ups flag either
+HEADER_V1 = struct.Struct('<4sHQIddI')
+# Final state: score, lives, level, ticks and digest of the blocks
+FINAL = struct.Struct('<qiiq20s')
+MAGIC = b'ARKR'
+VERSION = 3
+
+# Kinds of inputs
+MOTION = 0
+LAUNCH = 1
+SPLIT = 2
+
+
+def blocks_digest(engine):
+    '''Returns digest of the blocks left in the current level'''
+
+    return hashlib.sha1(bytes(engine.blocks.alive)).digest()
+
+
+class Recording:
+    '''Seed of a game and every input of its player stamped with the
+    engine\'s tick. A game replayed from it runs exactly like the
+    recorded one.
+
+    Attributes
+    ----------
+        seed : int
+            Seed of the engine
+        tick_rate : int
+            Number of simulation ticks per second
+        width : float
+            Width of the playground
+        height : float
+            Height of the playground
+        power_ups : bool
+            Whether hit blocks drop power-ups
+        board : tuple
+            Rows and columns of endless levels generated from the seed,
+            or None if the game was played with a levels file
+    '''
+
+    def __init__(self, seed, tick_rate=120, width=1180, height=730,
+            power_ups=False, board=None):
+        self.seed = seed
+        self.tick_rate = tick_rate
+        self.width = width
+        self.height = height
+        self.power_ups = power_ups
+        self.board = board
+
+        self.ticks = array('q')
+        self.kinds = array('B')
+        self.xs = array('d')
+        self.final = None
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def record_motion(self, tick, x):
+        '''Records a move of the platform.
+
+        Parameters
+        ----------
+            tick : int
+                Number of ticks simulated before the input
+            x : float
+                X coordinate the platform was moved to
+        '''
+
+        self.ticks.append(tick)
+        self.kinds.append(MOTION)
+        self.xs.append(x)
+
+    def record_launch(self, tick):
+        '''Records a shot of the ball.
+
+        Parameters
+        ----------
+            tick : int
+                Number of ticks simulated before the input
+        '''
+
+        self.ticks.append(tick)
+        self.kinds.append(LAUNCH)
+        self.xs.append(0)
+
+    def record_split(self, tick, count):
+        '''Records a split of the ball into more balls.
+
+        Parameters
+        ----------
+            tick : int
+                Number of ticks simulated before the input
+            count : int
+                Number of added balls
+        '''
+
+        self.ticks.append(tick)
+        self.kinds.append(SPLIT)
+        self.xs.append(count)
+
+    def finish(self, engine):
+        '''Keeps the final state of a game to check replays against it.
+
+        Parameters
+        ----------
+            engine : object
+                GameEngine object of the recorded game
+        '''
+
+        self.width = engine.width
+        self.height = engine.height
+        self.power_ups = engine.power_ups
+        state = engine.state
+        self.final = (
+            state.score, state.lives, state.level, engine.ticks,
+            blocks_digest(engine)
+        )
+
+    def save(self, path):
+        '''Writes the recording into a file.
+
+        Parameters
+        ----------
+            path : str
+                Path to the file
+        '''
+
+        ticks, kinds, xs = self.ticks, self.kinds, self.xs
+        if sys.byteorder == 'big':
+            ticks, xs = array('q', ticks), array('d', xs)
+            ticks.byteswap()
+            xs.byteswap()
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(
+                MAGIC, VERSION, self.seed, self.tick_rate,
+                self.width, self.height, len(self), self.power_ups,
+                *(self.board or (0, 0))
+            ))
+            f.write(ticks.tobytes())
+            f.write(kinds.tobytes())
+            f.write(xs.tobytes())
+            f.write(FINAL.pack(*self.final))
+
+    @classmethod
+    def load(cls, path):
+        '''Reads a recording from a file.
+
+        Parameters
+        ----------
+            path : str
+                Path to the file
+        '''
+
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        magic, version = struct.unpack_from('<4sH', data, 0)
+        if magic != MAGIC or version not in (1, 2, VERSION):
+            raise ValueError(f'{path} is not a recording')
+
+        rows = columns = 0
+        if version == 1:
+            header = HEADER_V1
+            power_ups = False
+            _, _, seed, tick_rate, width, height, count = \
+                header.unpack_from(data, 0)
+        elif version == 2:
+            header = HEADER_V2
+            _, _, seed, tick_rate, width, height, count, power_ups = \
+                header.unpack_from(data, 0)
+        else:
+            header = HEADER
+            _, _, seed, tick_rate, width, height, count, power_ups, rows, \
+                columns = header.unpack_from(data, 0)
+
+        board = (rows, columns) if rows else None
+        recording = cls(seed, tick_rate, width, height, power_ups, board)
+
+        offset = header.size
+        recording.ticks.frombytes(data[offset:offset + 8*count])
+        offset += 8*count
+        recording.kinds.frombytes(data[offset:offset + count])
+        offset += count
+        recording.xs.frombytes(data[offset:offset + 8*count])
+        offset += 8*count
+
+        if sys.byteorder == 'big':
+            recording.ticks.byteswap()
+            recording.xs.byteswap()
+
+        recording.final = FINAL.unpack_from(data, offset)
+
+        return recording
+
+
+def recorded_levels(recording, path):
+    '''Returns levels a recorded game was played with.
+
+    Parameters
+    ----------
+        recording : object
+            Recording object
+        path : str
+            Path to the levels file, used if the levels weren\'t
+            generated
+
+    Returns
+    -------
+        levels : object
+            LevelStore or ProceduralLevels object
+    '''
+
+    if recording.board is not None:
+        rows, columns = recording.board
+        return ProceduralLevels(recording.seed, rows, columns)
+
+    return get_level_store(path)
+
+
+def run_until(engine, tick, on_tick=None):
+    '''Simulates ticks until the engine reaches a tick, the ball waits
+    to be shot or the game is over.
+
+    Parameters
+    ----------
+        engine : object
+            GameEngine object
+        tick : int
+            Number of the tick
+        on_tick : function
+            Function called with the engine after every tick, or None
+    '''
+
+    while engine.ticks < tick:
+        if on_tick is None:
+            engine.step(tick - engine.ticks)
+        else:
+            engine.step()
+            on_tick(engine)
+
+        if not engine.ball_shot or not engine.state.lives:
+            break
+
+
+def replay(recording, levels, on_tick=None):
+    '''Simulates a recorded game headless as fast as possible.
+
+    Parameters
+    ----------
+        recording : object
+            Recording object
+        levels : object
+            LevelStore object the game was played with
+        on_tick : function
+            Function called with the engine after every tick, e.g. to
+            draw frames, or None
+
+    Returns
+    -------
+        engine : object
+            GameEngine object in the final state
+    '''
+
+    engine = GameEngine(
+        levels,
+        width=recording.width,
+        height=recording.height,
+        seed=recording.seed,
+        tick_rate=recording.tick_rate,
+        power_ups=recording.power_ups
+    )
+    engine.load_level()
+
+    for tick, kind, x in zip(recording.ticks, recording.kinds, recording.xs):
+        run_until(engine, tick, on_tick)
+
+        if kind == MOTION:
+            engine.move_platform(x)
+        elif kind == LAUNCH:
+            engine.launch()
+        else:
+            engine.add_balls(int(x))
+
+    run_until(engine, recording.final[3], on_tick)
+
+    return engine
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Replays a recorded game headless and checks that it '
+        'ends in the recorded state'
+    )
+    parser.add_argument('recording', help='path to a recording')
+    parser.add_argument(
+        '--levels',
+        default=DEFAULT_LEVELS,
+        help='path to the levels file the game was played with, '
+        'ignored for endless games'
+    )
+    args = parser.parse_args()
+
+    recording = Recording.load(args.recording)
+
+    levels = recorded_levels(recording, args.levels)
+    start = time.perf_counter()
+    engine = replay(recording, levels)
+    seconds = time.perf_counter() - start
+
+    state = engine.state
+    final = (
+        state.score, state.lives, state.level, engine.ticks,
+        blocks_digest(engine)
+    )
+    print(
+        f'Replayed {len(recording)} inputs and {engine.ticks} ticks in '
+        f'{seconds:.2f} s ({engine.ticks / max(seconds, 1e-9):.0f} ticks/s)'
+    )
+    print(
+        f'Score {state.score}, lives {state.lives}, level {state.level}, '
+        f'{len(engine.blocks)} blocks left'
+    )
+
+    if final != tuple(recording.final):
+        print('MISMATCH with the recorded game:')
+        print(f'recorded score {recording.final[0]}, lives '
+            f'{recording.final[1]}, level {recording.final[2]}, ticks '
+            f'{recording.final[3]}')
+        sys.exit(1)
+
+    print('OK, the replay matches the recorded game')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,471 @@
+#!/usr/bin/env python3
+
+import argparse
+import heapq
+import itertools
+import math
+from random import Random
+import sys
+import time
+
+
+class Timer:
+    '''Callback waiting in a Scheduler. Cancelled timers stay in the
+    heap and are skipped when they are due.
+
+    Attributes
+    ----------
+        due : float
+            Time the callback is due at
+        session : object
+            Session object the callback belongs to
+        callback : function
+            Function to call
+        args : tuple
+            Arguments of the function
+    '''
+
+    __slots__ = ('due', 'session', 'callback', 'args', 'cancelled', 'job')
+
+    def __init__(self, due, session, callback, args):
+        self.due = due
+        self.session = session
+        self.callback = callback
+        self.args = args
+        self.cancelled = False
+
+        # tkinter\'s idle callback, see Session.after_idle
+        self.job = None
+
+
+class Session:
+    '''Timed work of one game. Its methods work like tkinter\'s after,
+    after_idle and after_cancel, so a game can use them instead of its
+    window\'s ones.
+
+    Attributes
+    ----------
+        scheduler : object
+            Scheduler object
+        name : str
+            Name of the session shown in statistics
+        weight : float
+            Share of CPU time relative to other sessions
+    '''
+
+    def __init__(self, scheduler, name, weight=1, runtime=0):
+        self.scheduler = scheduler
+        self.name = name
+        self.weight = weight
+
+        # CPU seconds divided by the weight, the smallest one runs first
+        self.runtime = runtime
+        self.cpu = 0
+        self.calls = 0
+        self.timers = set()
+
+    def after(self, ms, callback, *args):
+        '''Calls a function after a delay.
+
+        Parameters
+        ----------
+            ms : int
+                Delay in milliseconds
+            callback : function
+                Function to call
+            args : tuple
+                Arguments of the function
+
+        Returns
+        -------
+            timer : object
+                Timer object that can be cancelled
+        '''
+
+        return self.scheduler.schedule(self, ms / 1000, callback, args)
+
+    def after_idle(self, callback, *args):
+        '''Calls a function once the event loop is idle, after pending
+        events and redraws. Runs as soon as possible when headless.'''
+
+        scheduler = self.scheduler
+        if scheduler.master is None:
+            return scheduler.schedule(self, 0, callback, args)
+
+        timer = Timer(scheduler.timer(), self, callback, args)
+        timer.job = scheduler.master.after_idle(scheduler.call, timer)
+        self.timers.add(timer)
+
+        return timer
+
+    def cancel(self, timer):
+        '''Cancels a timer, None and finished timers are ignored.
+
+        Parameters
+        ----------
+            timer : object
+                Timer object returned by after or after_idle
+        '''
+
+        if timer is not None:
+            timer.cancelled = True
+            self.timers.discard(timer)
+            self.scheduler.cancel_job(timer)
+
+    def close(self):
+        '''Cancels all timers of the session and leaves the scheduler'''
+
+        for timer in self.timers:
+            timer.cancelled = True
+            self.scheduler.cancel_job(timer)
+        self.timers.clear()
+        self.scheduler.remove(self)
+
+
+class Scheduler:
+    '''Runs timed work of several game sessions in one process, either
+    on top of a tkinter root with a single after chain or headless.
+
+    CPU time is split by the weights of sessions that compete for it:
+    due callbacks of the session that has used the least CPU time
+    relative to its weight run first, and a session that is more than
+    a slice of max_busy seconds ahead of it waits until the others
+    catch up. A session that needs less than its share leaves the rest
+    to the others. A pump that runs longer than max_busy leaves the
+    rest of the due callbacks for the next one, so the window stays
+    responsive and an expensive session can\'t starve the others.
+
+    Attributes
+    ----------
+        master : object
+            tkinter root window object, or None to run headless with
+            run()
+        timer : function
+            Function that returns current time in seconds
+        max_busy : float
+            Seconds a pump may run callbacks before it yields
+    '''
+
+    def __init__(self, master=None, timer=time.perf_counter, max_busy=0.02):
+        self.master = master
+        self.timer = timer
+        self.max_busy = max_busy
+
+        self.heap = []
+        self.order = itertools.count()
+        self.sessions = []
+
+        # Least runtime of sessions with due callbacks, never decreases
+        self.floor = 0
+
+        # The only tkinter timer, set for the earliest due callback
+        self._job = None
+        self._job_due = None
+
+    def session(self, name='', weight=1):
+        '''Adds a session.
+
+        Parameters
+        ----------
+            name : str
+                Name of the session shown in statistics
+            weight : float
+                Share of CPU time relative to other sessions
+
+        Returns
+        -------
+            session : object
+                Session object
+        '''
+
+        # Starts level with the others instead of owing them time
+        runtime = min(
+            (session.runtime for session in self.sessions), default=0
+        )
+        session = Session(self, name, weight, runtime)
+        self.sessions.append(session)
+
+        return session
+
+    def remove(self, session):
+        '''Forgets a session, see Session.close'''
+
+        if session in self.sessions:
+            self.sessions.remove(session)
+
+    def schedule(self, session, delay, callback, args):
+        '''Adds a timer, see Session.after.
+
+        Parameters
+        ----------
+            session : object
+                Session object
+            delay : float
+                Delay in seconds
+            callback : function
+                Function to call
+            args : tuple
+                Arguments of the function
+
+        Returns
+        -------
+            timer : object
+                Timer object
+        '''
+
+        timer = Timer(self.timer() + delay, session, callback, args)
+        heapq.heappush(self.heap, (timer.due, next(self.order), timer))
+        session.timers.add(timer)
+
+        if self.master is not None:
+            self.wake()
+
+        return timer
+
+    def cancel_job(self, timer):
+        '''Cancels tkinter\'s idle callback of a timer, if it has one'''
+
+        if timer.job is not None:
+            self.master.after_cancel(timer.job)
+            timer.job = None
+
+    def call(self, timer):
+        '''Runs a timer\'s callback and charges its session for the CPU
+        time.
+
+        Parameters
+        ----------
+            timer : object
+                Timer object
+        '''
+
+        if timer.cancelled:
+            return
+
+        session = timer.session
+        session.timers.discard(timer)
+        timer.job = None
+        start = self.timer()
+        try:
+            timer.callback(*timer.args)
+        except Exception:
+            if self.master is None:
+                raise
+            self.master.report_callback_exception(*sys.exc_info())
+        finally:
+            spent = self.timer() - start
+            session.cpu += spent
+            session.runtime += spent / session.weight
+            session.calls += 1
+
+    def next_due(self):
+        '''Returns time the next callback is due at, or None'''
+
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+
+        return heap[0][0] if heap else None
+
+    def wake(self):
+        '''Sets the tkinter timer for the earliest due callback'''
+
+        due = self.next_due()
+        if due is None or self._job is not None and self._job_due <= due:
+            return
+
+        if self._job is not None:
+            self.master.after_cancel(self._job)
+
+        # Rounded up, so the pump never fires before the callback is due
+        delay = max(math.ceil((due - self.timer()) * 1000), 0)
+        self._job = self.master.after(delay, self.pump)
+        self._job_due = due
+
+    def pump(self):
+        '''Runs due callbacks from the tkinter timer'''
+
+        self._job = None
+        self._job_due = None
+        self.run_due()
+        self.wake()
+
+    def run_due(self):
+        '''Runs callbacks that are due, least served sessions first.
+
+        Returns
+        -------
+            count : int
+                Number of called callbacks
+        '''
+
+        heap = self.heap
+        now = self.timer()
+
+        due = []
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            if not timer.cancelled:
+                due.append(timer)
+
+        if not due:
+            return 0
+
+        # A session that was idle gets back at most one slice of the
+        # time it didn\'t use, so it doesn\'t starve the others later
+        sessions = {timer.session for timer in due}
+        for session in sessions:
+            session.runtime = max(session.runtime, self.floor - self.max_busy)
+        least = min(session.runtime for session in sessions)
+        self.floor = max(self.floor, least)
+
+        # Sorting is stable, so a session keeps the order of its timers
+        due.sort(key=lambda timer: timer.session.runtime)
+
+        count = 0
+        for index, timer in enumerate(due):
+            # A callback can cancel timers that are due as well
+            if timer.cancelled:
+                continue
+
+            # The rest is due first in the next pump
+            if count and self.timer() - now > self.max_busy:
+                for waiting in due[index:]:
+                    heapq.heappush(heap, (now, next(self.order), waiting))
+                break
+
+            # Sessions too far ahead wait for the others to catch up
+            if timer.session.runtime > least + self.max_busy:
+                heapq.heappush(heap, (now, next(self.order), timer))
+                continue
+
+            self.call(timer)
+            count += 1
+
+        return count
+
+    def run(self, seconds=None, sleep=time.sleep):
+        '''Runs callbacks headless until no timers are left or for a
+        time.
+
+        Parameters
+        ----------
+            seconds : float
+                Time to run for, or None to run while there are timers
+            sleep : function
+                Function that waits for a number of seconds
+        '''
+
+        end = None if seconds is None else self.timer() + seconds
+
+        while True:
+            due = self.next_due()
+            if due is None:
+                break
+
+            now = self.timer()
+            if end is not None:
+                if now >= end:
+                    break
+                due = min(due, end)
+
+            if due > now:
+                sleep(due - now)
+            self.run_due()
+
+    def stats(self):
+        '''Returns CPU time of every session.
+
+        Returns
+        -------
+            stats : list
+                Dicts of session\'s name, weight, CPU seconds, share of
+                the CPU time of all sessions and number of callbacks
+        '''
+
+        total = sum(session.cpu for session in self.sessions) or 1
+
+        return [
+            {
+                'name': session.name,
+                'weight': session.weight,
+                'cpu': session.cpu,
+                'share': session.cpu / total,
+                'calls': session.calls
+            }
+            for session in self.sessions
+        ]
+
+
+def main():
+    # Heavy modules are needed only by the demo
+    from analyze_levels import FollowBallPolicy
+    from engine import GameEngine
+    from level_store import DEFAULT_LEVELS
+    from level_store import get_level_store
+
+    parser = argparse.ArgumentParser(
+        description='Plays several scripted games headless in one process '
+        'and shows how CPU time is split between them'
+    )
+    parser.add_argument(
+        '--sessions', type=int, default=4, help='number of games'
+    )
+    parser.add_argument(
+        '--seconds', type=float, default=5, help='time to play for'
+    )
+    parser.add_argument(
+        '--balls', type=int, default=1,
+        help='balls of the last game, the others play with one'
+    )
+    parser.add_argument(
+        '--frame-rate', type=int, default=60,
+        help='number of frames per second of every game'
+    )
+    parser.add_argument(
+        '--levels',
+        default=DEFAULT_LEVELS,
+        help='path to the levels file'
+    )
+    args = parser.parse_args()
+
+    scheduler = Scheduler()
+    levels = get_level_store(args.levels)
+    delay = max(1000 // args.frame_rate, 1)
+    ticks_per_frame = max(120 // args.frame_rate, 1)
+
+    def play(session, engine, policy):
+        for _ in range(ticks_per_frame):
+            policy.move(engine)
+            result = engine.step()
+            if result in ('LOST LIFE', 'FINISHED LEVEL'):
+                engine.launch()
+            elif result != 'OK' and result != 'HIT':
+                return
+        session.after(delay, play, session, engine, policy)
+
+    engines = []
+    for index in range(args.sessions):
+        engine = GameEngine(levels, seed=index)
+        engine.state.lives = 10**9
+        engine.load_level()
+        engine.launch()
+        if index == args.sessions - 1:
+            engine.add_balls(args.balls - 1)
+        engines.append(engine)
+
+        session = scheduler.session(f'game {index + 1}')
+        policy = FollowBallPolicy(Random(index))
+        session.after_idle(play, session, engine, policy)
+
+    scheduler.run(args.seconds)
+
+    for stats, engine in zip(scheduler.stats(), engines):
+        print(
+            f'{stats["name"]}: {engine.ticks} ticks, {len(engine.balls)} '
+            f'balls, {stats["cpu"]:.2f} s CPU ({stats["share"]:.0%})'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+
+import argparse
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    session TEXT PRIMARY KEY,
+    pack TEXT NOT NULL,
+    seed INTEGER,
+    started REAL NOT NULL,
+    ended REAL,
+    score INTEGER,
+    level INTEGER,
+    lives INTEGER,
+    ticks INTEGER
+);
+CREATE INDEX IF NOT EXISTS games_pack_score ON games (pack, score DESC);
+
+CREATE TABLE IF NOT EXISTS level_clears (
+    session TEXT NOT NULL,
+    pack TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    ticks INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS level_clears_pack_level
+    ON level_clears (pack, level, seconds);
+
+CREATE TABLE IF NOT EXISTS telemetry (
+    session TEXT NOT NULL,
+    time REAL NOT NULL,
+    name TEXT NOT NULL,
+    value REAL
+);
+CREATE INDEX IF NOT EXISTS telemetry_session ON telemetry (session, name);
+'''
+
+# Statements the writer runs, records only carry their names
+STATEMENTS = {
+    'start': 'INSERT INTO games (session, pack, seed, started) '
+        'VALUES (?, ?, ?, ?)',
+    'finish': 'UPDATE games SET ended = ?, score = ?, level = ?, lives = ?, '
+        'ticks = ? WHERE session = ?',
+    'clear': 'INSERT INTO level_clears VALUES (?, ?, ?, ?, ?)',
+    'telemetry': 'INSERT INTO telemetry VALUES (?, ?, ?, ?)'
+}
+
+# Record that stops the writer
+STOP = ('stop', None)
+
+
+class ScoreStore:
+    '''High scores, clear times of levels and telemetry of sessions in
+    an SQLite database.
+
+    Records are put into a bounded queue and written in batches by a
+    background thread, one transaction per batch, so recording never
+    waits for the disk. If the queue is full, records are dropped and
+    counted instead of stalling the game. Queries use their own
+    connection and read the database in WAL mode, so they don\'t wait
+    for the writer either.
+
+    Attributes
+    ----------
+        path : str
+            Path to the database file
+        batch_size : int
+            Maximal number of records written in one transaction
+        flush_interval : float
+            Seconds the writer waits for more records before it writes
+            a batch
+        max_pending : int
+            Maximal number of records waiting to be written
+    '''
+
+    def __init__(self, path, batch_size=256, flush_interval=0.5,
+            max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.executescript(SCHEMA)
+        self.connection.commit()
+
+        self.pending = queue.Queue(max_pending)
+        self.writer = threading.Thread(
+            target=self.write_batches, name='score-store', daemon=True
+        )
+        self.writer.start()
+
+    def put(self, record):
+        '''Queues a record without waiting.
+
+        Parameters
+        ----------
+            record : tuple
+                Name of a statement and its parameters
+        '''
+
+        try:
+            self.pending.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def write_batches(self):
+        '''Writes queued records until the store is closed. Runs in the
+        writer thread.'''
+
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA synchronous=NORMAL')
+
+        stopped = False
+        while not stopped:
+            batch = [self.pending.get()]
+
+            # Collects more records for the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size and batch[-1] is not STOP:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self.pending.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            try:
+                with connection:
+                    for name, parameters in batch:
+                        if name == 'stop':
+                            stopped = True
+                        else:
+                            connection.execute(STATEMENTS[name], parameters)
+            except sqlite3.Error as error:
+                print(f'Failed to save {len(batch)} records: {error}')
+            finally:
+                for _ in batch:
+                    self.pending.task_done()
+
+        connection.close()
+
+    def start_session(self, pack, seed=None):
+        '''Starts recording a game.
+
+        Parameters
+        ----------
+            pack : str
+                Name of the levels the game is played with
+            seed : int
+                Seed of the game
+
+        Returns
+        -------
+            session : object
+                Session object that records the game
+        '''
+
+        session = Session(self, uuid.uuid4().hex, pack)
+        self.put(('start', (session.id, pack, seed, time.time())))
+
+        return session
+
+    def top_scores(self, pack, count=10):
+        '''Returns the best finished games of a levels pack.
+
+        Parameters
+        ----------
+            pack : str
+                Name of the levels
+            count : int
+                Number of games
+
+        Returns
+        -------
+            scores : list
+                Tuples of score, reached level, end time and session id
+                from the best game
+        '''
+
+        return self.connection.execute(
+            'SELECT score, level, ended, session FROM games '
+            'WHERE pack = ? AND score IS NOT NULL '
+            'ORDER BY score DESC LIMIT ?',
+            (pack, count)
+        ).fetchall()
+
+    def best_clear_times(self, pack, level, count=10):
+        '''Returns the fastest clears of a level.
+
+        Parameters
+        ----------
+            pack : str
+                Name of the levels
+            level : int
+                Number of a level
+            count : int
+                Number of clears
+
+        Returns
+        -------
+            clears : list
+                Tuples of seconds, ticks and session id from the
+                fastest clear
+        '''
+
+        return self.connection.execute(
+            'SELECT seconds, ticks, session FROM level_clears '
+            'WHERE pack = ? AND level = ? ORDER BY seconds LIMIT ?',
+            (pack, level, count)
+        ).fetchall()
+
+    def flush(self):
+        '''Waits until all queued records are written'''
+
+        self.pending.join()
+
+    def close(self):
+        '''Writes queued records and stops the writer'''
+
+        if self.writer.is_alive():
+            self.pending.put(STOP)
+            self.writer.join()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Session:
+    '''Records one game into a ScoreStore. Every method only queues a
+    record, so it can be called from the frame loop.
+
+    Attributes
+    ----------
+        store : object
+            ScoreStore object
+        id : str
+            Unique id of the session
+        pack : str
+            Name of the levels the game is played with
+    '''
+
+    def __init__(self, store, id, pack):
+        self.store = store
+        self.id = id
+        self.pack = pack
+        self.finished = False
+
+    def level_cleared(self, level, ticks, tick_rate):
+        '''Records how long it took to clear a level.
+
+        Parameters
+        ----------
+            level : int
+                Number of the level
+            ticks : int
+                Simulation ticks the level was played for
+            tick_rate : int
+                Number of simulation ticks per second
+        '''
+
+        self.store.put(
+            ('clear', (self.id, self.pack, level, ticks, ticks / tick_rate))
+        )
+
+    def record(self, name, value):
+        '''Records a number about the session, e.g. frames per second.
+
+        Parameters
+        ----------
+            name : str
+                Name of the number
+            value : float
+                The number
+        '''
+
+        self.store.put(('telemetry', (self.id, time.time(), name, value)))
+
+    def finish(self, state, ticks):
+        '''Records the result of the game, only once.
+
+        Parameters
+        ----------
+            state : object
+                GameState object at the end of the game
+            ticks : int
+                Simulation ticks the game was played for
+        '''
+
+        if self.finished:
+            return
+        self.finished = True
+
+        self.store.put(('finish', (
+            time.time(), state.score, state.level, state.lives, ticks,
+            self.id
+        )))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Prints high scores and the fastest clears of levels'
+    )
+    parser.add_argument('database', help='path to the scores database')
+    parser.add_argument(
+        '--pack', default='levels.json', help='name of the levels'
+    )
+    parser.add_argument(
+        '--level', type=int, help='prints the fastest clears of a level'
+    )
+    parser.add_argument(
+        '--top', type=int, default=10, help='number of printed entries'
+    )
+    args = parser.parse_args()
+
+    with ScoreStore(args.database) as store:
+        if args.level is None:
+            for place, (score, level, ended, _) in enumerate(
+                    store.top_scores(args.pack, args.top), 1):
+                date = time.strftime('%Y-%m-%d %H:%M', time.localtime(ended))
+                print(f'{place:>3}. {score:>8}  level {level:<4} {date}')
+        else:
+            for place, (seconds, ticks, _) in enumerate(
+                    store.best_clear_times(args.pack, args.level, args.top),
+                    1):
+                print(f'{place:>3}. {seconds:>8.2f} s  {ticks} ticks')
+
+
+if __name__ == '__main__':
+    main()
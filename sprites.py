@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+
+import os
+
+
+class SpriteCache:
+    '''Decodes every game picture once and shares its images between
+    all objects that draw it. Pictures can be decoded and resized on a
+    worker thread, only PhotoImage objects have to be created on the
+    tkinter\'s one.
+
+    Attributes
+    ----------
+        pics_dir : str
+            Path to the directory with game\'s pictures
+    '''
+
+    def __init__(self, pics_dir):
+        self.pics_dir = pics_dir
+        self.images = {}
+        self.photos = {}
+        self.colors = {}
+        self.hits = 0
+        self.misses = 0
+
+    def image(self, name, size=None):
+        '''Returns decoded picture.
+
+        Parameters
+        ----------
+            name : str
+                Name of a picture without extension, e.g. "ball"
+            size : tuple
+                Width,height to resize the picture to, or None to keep
+                its own size
+
+        Returns
+        -------
+            image : object
+                PIL image object
+        '''
+
+        key = name if size is None else (name, size)
+        image = self.images.get(key)
+        if image is None:
+            if size is None:
+                # Pillow is imported with the first picture
+                from PIL import Image
+                image = Image.open(
+                    os.path.join(self.pics_dir, name + '.png')
+                )
+                image.load()
+            else:
+                image = self.image(name)
+                if size != image.size:
+                    image = image.resize(size)
+            self.images[key] = image
+
+        return image
+
+    def cached(self, name, size=None):
+        '''Checks whether a picture is already decoded, see image'''
+
+        key = name if size is None else (name, size)
+        return key in self.images
+
+    def photo(self, name, size=None):
+        '''Returns picture that can be drawn on a canvas.
+
+        Parameters
+        ----------
+            name : str
+                Name of a picture without extension, e.g. "ball"
+            size : tuple
+                Width,height to resize the picture to, or None to keep
+                its own size
+
+        Returns
+        -------
+            photo : object
+                ImageTk.PhotoImage object
+        '''
+
+        key = name if size is None else (name, size)
+        photo = self.photos.get(key)
+        if photo is None:
+            self.misses += 1
+            from PIL import ImageTk
+            photo = ImageTk.PhotoImage(self.image(name, size))
+            self.photos[key] = photo
+        else:
+            self.hits += 1
+
+        return photo
+
+    def block(self, variant, scale=None):
+        '''Returns picture of a block variation.
+
+        Parameters
+        ----------
+            variant : int
+                Number of a block\'s image variation
+            scale : tuple
+                Horizontal and vertical scale of the picture, or None
+                to keep its size
+        '''
+
+        name = 'block_' + str(variant)
+        return self.photo(name, self.block_size(name, scale))
+
+    def block_image(self, variant, scale=None):
+        '''Returns decoded picture of a block variation. Can be called
+        from any thread.
+
+        Parameters
+        ----------
+            variant : int
+                Number of a block\'s image variation
+            scale : tuple
+                Horizontal and vertical scale of the picture, or None
+                to keep its size
+        '''
+
+        name = 'block_' + str(variant)
+        return self.image(name, self.block_size(name, scale))
+
+    def block_size(self, name, scale):
+        '''Returns width,height of a scaled block picture, or None if it
+        isn\'t scaled'''
+
+        if scale is None:
+            return None
+
+        width, height = self.image(name).size
+        return (
+            max(round(width * scale[0]), 1),
+            max(round(height * scale[1]), 1)
+        )
+
+    def average_color(self, name):
+        '''Returns average color of the opaque part of a picture.
+
+        Parameters
+        ----------
+            name : str
+                Name of a picture without extension, e.g. "block_1"
+
+        Returns
+        -------
+            color : str
+                Color like "#324851"
+        '''
+
+        color = self.colors.get(name)
+        if color is None:
+            from PIL import ImageStat
+
+            image = self.image(name).convert('RGBA')
+            red, green, blue = ImageStat.Stat(
+                image.convert('RGB'), mask=image.getchannel('A')
+            ).mean
+            color = f'#{round(red):02x}{round(green):02x}{round(blue):02x}'
+            self.colors[name] = color
+
+        return color
+
+    def stats(self):
+        '''Returns numbers of cache hits and misses'''
+
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+_caches = {}
+
+
+def get_sprite_cache(pics_dir):
+    '''Returns the process-wide sprite cache of a pictures directory.
+
+    Parameters
+    ----------
+        pics_dir : str
+            Path to the directory with game\'s pictures
+    '''
+
+    pics_dir = os.path.realpath(pics_dir)
+    cache = _caches.get(pics_dir)
+    if cache is None:
+        cache = SpriteCache(pics_dir)
+        _caches[pics_dir] = cache
+
+    return cache
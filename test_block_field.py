@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from block_field import BlockField
+from engine import GameEngine
+from level_store import LevelStore
+
+
+class BlockFieldTest(unittest.TestCase):
+    '''Cells at the edges of the grid have to behave like the inner
+    ones'''
+
+    def create(self, rows=3, columns=5):
+        '''Returns a full field of 10x5 cells, its grid starts at 5,17.5'''
+
+        blocks = BlockField(rows, columns, 10, 20, 10, 5)
+        for row in range(rows):
+            for column in range(columns):
+                blocks.add(row, column)
+
+        return blocks
+
+    def test_index(self):
+        blocks = self.create()
+
+        self.assertEqual(blocks.index(0, 0), 0)
+        self.assertEqual(blocks.index(0, 4), 4)
+        self.assertEqual(blocks.index(1, 0), 5)
+        self.assertEqual(blocks.index(2, 4), 14)
+        self.assertEqual(blocks.cell_center(2, 4), (50, 30))
+        self.assertEqual(
+            (blocks.xs[14], blocks.ys[14]), blocks.cell_center(2, 4)
+        )
+
+    def test_remove(self):
+        blocks = self.create()
+
+        # The first and the last cell, the last one is in a partly used
+        # byte of the bitmask
+        for block in (0, 14):
+            blocks.remove(block)
+            self.assertFalse(blocks.is_alive(block))
+        self.assertEqual(len(blocks), 13)
+
+        # Removed blocks are removed only once
+        blocks.remove(14)
+        self.assertEqual(len(blocks), 13)
+
+        # Neighbours across byte boundaries are kept
+        blocks.remove(7)
+        blocks.remove(8)
+        self.assertEqual(list(blocks), [13, 12, 11, 10, 9, 6, 5, 4, 3, 2, 1])
+
+        blocks.add(2, 4)
+        self.assertTrue(blocks.is_alive(14))
+        self.assertEqual(len(blocks), 12)
+
+    def test_query_edges(self):
+        blocks = self.create()
+
+        # Boxes beyond the grid are clipped to it
+        self.assertEqual(
+            sorted(blocks.query(-100, -100, 1000, 1000)), list(range(15))
+        )
+
+        # Boxes touching the outer edges find the edge cells
+        self.assertEqual(blocks.query(0, 17.5, 5, 17.5), [0])
+        self.assertEqual(blocks.query(55, 32.5, 60, 40), [14])
+
+        # Boxes outside the grid find nothing
+        self.assertEqual(blocks.query(0, 0, 4.9, 100), [])
+        self.assertEqual(blocks.query(55.1, 0, 100, 100), [])
+        self.assertEqual(blocks.query(0, 32.6, 100, 100), [])
+        self.assertEqual(blocks.query(0, 0, 100, 17.4), [])
+
+    def test_query_order(self):
+        blocks = self.create()
+        blocks.remove(blocks.index(1, 1))
+
+        # Starting from the last cell, removed blocks are skipped
+        self.assertEqual(blocks.query(10, 20, 20, 25), [5, 1, 0])
+
+
+class OpenSpaceTest(unittest.TestCase):
+    '''Balls in open space can\'t hit anything, balls near the walls,
+    the platform or the grid have to be checked'''
+
+    def setUp(self):
+        matrix = [['b'] * 18 for _ in range(12)]
+        self.engine = GameEngine(LevelStore.from_levels({'level1': matrix}))
+        self.engine.load_level()
+
+    def test_open_space(self):
+        # Between the grid, whose bottom is at 525.5, and the platform,
+        # whose top is at 670
+        self.assertTrue(self.engine.in_open_space(300, 600, 5, 5))
+        self.assertTrue(self.engine.in_open_space(300, 533.1, 0, 5))
+
+    def test_walls(self):
+        engine = self.engine
+
+        self.assertFalse(engine.in_open_space(7, 600, 1, 1))
+        self.assertFalse(engine.in_open_space(20, 600, -13, 1))
+        self.assertFalse(engine.in_open_space(engine.width - 7, 600, 0, 1))
+        self.assertFalse(engine.in_open_space(300, 10, 0, -5))
+        self.assertFalse(engine.in_open_space(300, 720, 0, 5))
+
+    def test_grid(self):
+        engine = self.engine
+
+        self.assertFalse(engine.in_open_space(300, 533, 0, 0))
+        self.assertFalse(engine.in_open_space(300, 540, 0, -7))
+
+        # Next to the grid\'s sides
+        self.assertFalse(engine.in_open_space(64, 300, 0, 1))
+        self.assertFalse(engine.in_open_space(1122, 300, 0, 1))
+        self.assertTrue(engine.in_open_space(63, 300, 0, 1))
+        self.assertTrue(engine.in_open_space(1123, 300, 0, 1))
+
+    def test_platform(self):
+        engine = self.engine
+        platform = engine.platform
+
+        self.assertFalse(engine.in_open_space(platform.x, 660, 0, 5))
+        self.assertFalse(engine.in_open_space(
+            platform.x - engine.platform_width/2 - 7, 660, 0, 5
+        ))
+        self.assertTrue(engine.in_open_space(
+            platform.x - engine.platform_width/2 - 8, 660, 0, 2
+        ))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+import unittest
+
+from collision import sweep_box
+from engine import GameEngine
+from level_store import LevelStore
+
+
+class SweepBoxTest(unittest.TestCase):
+    '''Moving points enter boxes through the side they cross last'''
+
+    def test_sides(self):
+        self.assertEqual(sweep_box(0, 5, 10, 0, 4, 0, 8, 10), (0.4, -1, 0))
+        self.assertEqual(sweep_box(10, 5, -10, 0, 0, 0, 4, 10), (0.6, 1, 0))
+        self.assertEqual(sweep_box(5, 0, 0, 10, 0, 4, 10, 8), (0.4, 0, -1))
+        self.assertEqual(sweep_box(5, 10, 0, -10, 0, 0, 10, 4), (0.6, 0, 1))
+
+    def test_corner(self):
+        self.assertEqual(sweep_box(0, 0, 10, 10, 5, 5, 8, 8), (0.5, -1, -1))
+
+    def test_misses(self):
+        # Too short, passing by and moving away
+        self.assertIsNone(sweep_box(0, 5, 3, 0, 4, 0, 8, 10))
+        self.assertIsNone(sweep_box(0, 20, 10, 0, 4, 0, 8, 10))
+        self.assertIsNone(sweep_box(0, 5, -10, 0, 4, 0, 8, 10))
+        self.assertIsNone(sweep_box(5, 20, 0, 10, 0, 0, 10, 4))
+
+
+class SweptCollisionTest(unittest.TestCase):
+    '''The ball bounces off everything on its way in the order of
+    impact at any tick rate'''
+
+    def create(self, matrix, tick_rate):
+        '''Returns an engine with a level and the ball shot'''
+
+        engine = GameEngine(
+            LevelStore.from_levels({'level1': matrix}), tick_rate=tick_rate
+        )
+        engine.load_level()
+        engine.launch()
+
+        return engine
+
+    def test_block_before_wall(self):
+        # 150 pixels per tick, the bottom row ends at 525.5
+        engine = self.create([[''] * 18] * 11 + [['b'] * 18], 4)
+        ball = engine.ball
+        ball.x, ball.y = 100, 560
+        ball.x_direction, ball.y_direction = -1, -1
+
+        self.assertEqual(engine.check_collision(), 'HIT')
+
+        # The block is hit at 73,533 and the left wall after it, a wall
+        # first would send the ball away from the block
+        blocks = engine.blocks
+        self.assertEqual(engine.removed_blocks, [blocks.index(11, 0)])
+        self.assertEqual((ball.x_direction, ball.y_direction), (1, 1))
+        self.assertAlmostEqual(ball.x, 65)
+        self.assertAlmostEqual(ball.y, 656)
+
+    def test_wall_before_block(self):
+        engine = self.create([[''] * 18] * 11 + [['b'] * 18], 4)
+        ball = engine.ball
+        ball.x, ball.y = 40, 620
+        ball.x_direction, ball.y_direction = -1, -1
+
+        self.assertEqual(engine.check_collision(), 'HIT')
+
+        # The left wall is reached at 7.5,587.5, the block's left side
+        # at 63.5,531.5 and the wall again at 7.5,475.5
+        blocks = engine.blocks
+        self.assertEqual(engine.removed_blocks, [blocks.index(11, 0)])
+        self.assertEqual((ball.x_direction, ball.y_direction), (1, -1))
+        self.assertAlmostEqual(ball.x, 13)
+        self.assertAlmostEqual(ball.y, 470)
+
+    def test_no_tunnelling(self):
+        # 300 pixels per tick, more than the height of 8 rows
+        engine = self.create([['b'] * 18 for _ in range(12)], 2)
+        ball = engine.ball
+        ball.x_direction, ball.y_direction = 0, -1
+        column = int((ball.x - engine.board_start[0]) / engine.block_width)
+
+        self.assertEqual(engine.step(), 'HIT')
+
+        # Only the lowest block of ball's column is removed
+        blocks = engine.blocks
+        self.assertEqual(engine.removed_blocks, [blocks.index(11, column)])
+        self.assertEqual(len(blocks), 12*18 - 1)
+        self.assertEqual(engine.state.score, 100)
+        self.assertGreater(ball.y, 533)
+
+
+if __name__ == '__main__':
+    unittest.main()
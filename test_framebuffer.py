@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+import os
+import unittest
+
+try:
+    import numpy as np
+    import PIL
+except ImportError:
+    np = None
+
+from engine import GameEngine
+from level_store import LevelStore
+
+
+game_dir = os.path.dirname(os.path.realpath(__file__))
+
+
+@unittest.skipIf(np is None, 'NumPy and Pillow are needed')
+class IncrementalRenderTest(unittest.TestCase):
+    '''Frames drawn incrementally have to match frames drawn from
+    scratch'''
+
+    def create(self, rows, columns):
+        '''Returns an engine with a full board and its renderer'''
+
+        from framebuffer import FrameRenderer
+
+        matrix = [['b'] * columns for _ in range(rows)]
+        engine = GameEngine(
+            LevelStore.from_levels({'level1': matrix}), seed=0
+        )
+        engine.load_level()
+        renderer = FrameRenderer(engine, os.path.join(game_dir, 'pics'))
+        renderer.render()
+
+        return engine, renderer
+
+    def assert_same_as_fresh(self, engine, renderer):
+        '''Compares the last frame with a frame of a new renderer'''
+
+        from framebuffer import FrameRenderer
+
+        fresh = FrameRenderer(engine, os.path.join(game_dir, 'pics'))
+        fresh.render()
+        different = np.count_nonzero(
+            (fresh.buffer != renderer.buffer).any(axis=2)
+        )
+        self.assertEqual(different, 0)
+
+    def check_board(self, rows, columns):
+        engine, renderer = self.create(rows, columns)
+
+        # Holes between blocks that are left on every side
+        blocks = engine.blocks
+        for row in range(1, rows - 1, 3):
+            for column in range(1, columns - 1, 3):
+                engine.delete_block(blocks.index(row, column))
+            renderer.render()
+            self.assert_same_as_fresh(engine, renderer)
+
+    def test_default_board(self):
+        self.check_board(12, 18)
+
+    def test_scaled_board(self):
+        # Offsets of scaled pictures end in .5 on this board
+        self.check_board(30, 45)
+
+    def test_played_game(self):
+        engine, renderer = self.create(30, 45)
+        engine.state.lives = 10**9
+        engine.launch()
+
+        for _ in range(3000):
+            engine.move_platform(engine.ball.x)
+            if engine.step() != 'OK':
+                engine.launch()
+            renderer.render()
+
+        self.assertLess(len(engine.blocks), 30 * 45)
+        self.assert_same_as_fresh(engine, renderer)
+
+
+if __name__ == '__main__':
+    unittest.main()
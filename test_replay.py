@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+import os
+from random import Random
+import struct
+import tempfile
+import unittest
+
+from engine import GameEngine
+from level_generator import ProceduralLevels
+from level_store import DEFAULT_LEVELS
+from level_store import get_level_store
+import replay
+from replay import Recording
+
+
+class RecordingTest(unittest.TestCase):
+    '''Recorded games have to be replayed into the recorded state'''
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'game.rec')
+
+    def play(self, recording, levels, ticks=6000):
+        '''Plays a scripted game into a recording and finishes it'''
+
+        engine = GameEngine(levels, seed=recording.seed, power_ups=True)
+        engine.recorder = recording
+        engine.load_level()
+        random = Random(recording.seed)
+
+        engine.launch()
+        engine.add_balls(2)
+        for tick in range(ticks):
+            if tick % 3 == 0:
+                engine.move_platform(
+                    engine.ball.x + random.uniform(-40, 40)
+                )
+            result = engine.step()
+            if result in ('LOST LIFE', 'FINISHED LEVEL'):
+                engine.launch()
+                if tick % 2:
+                    engine.add_balls(1)
+            elif result in ('GAME OVER', 'FINISHED GAME'):
+                break
+
+        recording.finish(engine)
+
+        return engine
+
+    def assert_replayed(self, recording, engine):
+        '''Saves, loads and replays a recording'''
+
+        recording.save(self.path)
+        loaded = Recording.load(self.path)
+
+        self.assertEqual(loaded.board, recording.board)
+        self.assertTrue(loaded.power_ups)
+        self.assertEqual(list(loaded.kinds), list(recording.kinds))
+
+        levels = replay.recorded_levels(loaded, DEFAULT_LEVELS)
+        replayed = replay.replay(loaded, levels)
+        state = replayed.state
+        self.assertEqual(
+            (
+                state.score, state.lives, state.level, replayed.ticks,
+                replay.blocks_digest(replayed)
+            ),
+            tuple(loaded.final)
+        )
+        self.assertEqual(tuple(loaded.final), recording.final)
+        self.assertEqual(replayed.state.score, engine.state.score)
+
+    def test_levels_file(self):
+        recording = Recording(3)
+        engine = self.play(recording, get_level_store(DEFAULT_LEVELS))
+
+        # Every kind of input was recorded
+        self.assertEqual(
+            set(recording.kinds),
+            {replay.MOTION, replay.LAUNCH, replay.SPLIT}
+        )
+        self.assert_replayed(recording, engine)
+
+    def test_endless_board(self):
+        recording = Recording(5, board=(20, 30))
+        engine = self.play(recording, ProceduralLevels(5, 20, 30))
+
+        self.assertEqual(engine.rows, 20)
+        self.assert_replayed(recording, engine)
+
+    def write_old(self, header, fields):
+        '''Writes a recording of an old version with one launch'''
+
+        with open(self.path, 'wb') as f:
+            f.write(header.pack(replay.MAGIC, *fields))
+            f.write(struct.pack('<qBd', 0, replay.LAUNCH, 0))
+            f.write(replay.FINAL.pack(100, 3, 1, 50, bytes(20)))
+
+    def test_version_1(self):
+        self.write_old(replay.HEADER_V1, (1, 7, 60, 800, 600, 1))
+        recording = Recording.load(self.path)
+
+        self.assertEqual(
+            (
+                recording.seed, recording.tick_rate, recording.width,
+                recording.height, recording.power_ups, recording.board
+            ),
+            (7, 60, 800, 600, False, None)
+        )
+        self.assertEqual(list(recording.kinds), [replay.LAUNCH])
+        self.assertEqual(recording.final, (100, 3, 1, 50, bytes(20)))
+
+    def test_version_2(self):
+        self.write_old(replay.HEADER_V2, (2, 7, 60, 800, 600, 1, True))
+        recording = Recording.load(self.path)
+
+        self.assertEqual(
+            (
+                recording.seed, recording.tick_rate, recording.width,
+                recording.height, recording.power_ups, recording.board
+            ),
+            (7, 60, 800, 600, True, None)
+        )
+        self.assertEqual(list(recording.ticks), [0])
+        self.assertEqual(recording.final, (100, 3, 1, 50, bytes(20)))
+
+    def test_not_a_recording(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'ARKL' + bytes(64))
+
+        with self.assertRaises(ValueError):
+            Recording.load(self.path)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+from random import Random
+import unittest
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from engine import GameEngine
+from level_store import LevelStore
+
+
+# Sparse level, so most games clear it within a few thousand ticks
+LEVEL = [
+    ['', 'b', '', 'b', '', 'b'] * 3,
+    [''] * 18,
+    [''] * 18,
+    ['b', '', ''] * 6
+]
+
+# Distances between the ball and the platform of every game, the
+# biggest ones lose balls
+OFFSETS = [0, 20, -30, 44, 40, -44, 10, 3, -17, 33, 46, -50, 48, -47, 70]
+
+
+@unittest.skipIf(np is None, 'NumPy is needed')
+class LockstepTest(unittest.TestCase):
+    '''Games simulated in lockstep have to match games simulated by the
+    scalar engine'''
+
+    def alive_blocks(self, engine):
+        '''Returns the alive mask of engine\'s blocks as a matrix'''
+
+        blocks = engine.blocks
+        return np.array([
+            [
+                bool(blocks.is_alive(blocks.index(row, column)))
+                for column in range(blocks.columns)
+            ]
+            for row in range(blocks.rows)
+        ])
+
+    def test_same_as_scalar_engine(self):
+        from vector_engine import LOST_LIFE
+        from vector_engine import VectorEngine
+
+        store = LevelStore.from_levels({'level1': LEVEL})
+        games = len(OFFSETS)
+
+        engines = []
+        for game in range(games):
+            engine = GameEngine(store, seed=game)
+            engine.load_level()
+            engine.launch()
+            engines.append(engine)
+
+        vector = VectorEngine(GameEngine(store), games)
+        vector.load_level()
+        vector.launch()
+
+        # Both engines get the same jittered inputs
+        randoms = [Random(game) for game in range(games)]
+        ended = {}
+        lost_lives = set()
+
+        for tick in range(5000):
+            offsets = [
+                offset + random.uniform(-8, 8)
+                for offset, random in zip(OFFSETS, randoms)
+            ]
+            vector.move_platforms(vector.x + offsets)
+            results = vector.step()
+            vector.launch(results == LOST_LIFE)
+
+            for game, engine in enumerate(engines):
+                if game in ended:
+                    continue
+
+                engine.move_platform(engine.ball.x + offsets[game])
+                result = engine.step()
+                if result == 'LOST LIFE':
+                    lost_lives.add(game)
+                    engine.launch()
+                elif result in ('GAME OVER', 'FINISHED GAME'):
+                    ended[game] = result
+
+                message = f'game {game}, tick {tick}'
+                self.assertEqual(
+                    (
+                        engine.ball.x, engine.ball.y, engine.platform.x,
+                        engine.state.score, engine.state.lives
+                    ),
+                    (
+                        vector.x[game], vector.y[game],
+                        vector.platform_x[game], vector.score[game],
+                        vector.lives[game]
+                    ),
+                    message
+                )
+                if result != 'OK':
+                    self.assertTrue(np.array_equal(
+                        self.alive_blocks(engine), vector.blocks[game]
+                    ), message)
+
+        # Balls were lost and levels were cleared on the way
+        self.assertIn('FINISHED GAME', ended.values())
+        self.assertIn('GAME OVER', ended.values())
+        self.assertTrue(lost_lives - {
+            game for game, result in ended.items() if result == 'GAME OVER'
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+
+import math
+
+import numpy as np
+
+
+# Results of a step of a game, more important results have bigger values
+OK = 0
+HIT = 1
+LOST_LIFE = 2
+GAME_OVER = 3
+CLEARED = 4
+
+
+def sweep_boxes(x, y, dx, dy, left, top, right, bottom):
+    '''Finds when moving points enter boxes. Works like
+    collision.sweep_box on arrays.
+
+    Parameters
+    ----------
+        x, y : array
+            Coordinates of points at the beginning of a move
+        dx, dy : array
+            Movements along the axes
+        left, top, right, bottom : array
+            Edges of boxes
+
+    Returns
+    -------
+        impacts : tuple
+            Arrays of times of impact, which are infinite where a box
+            isn\'t entered, and x,y of the hit sides\' normals
+    '''
+
+    moves_right = dx > 0
+    moves_left = dx < 0
+    moves_down = dy > 0
+    moves_up = dy < 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entry_x = np.where(moves_right, (left - x) / dx,
+            np.where(moves_left, (right - x) / dx, -np.inf))
+        exit_x = np.where(moves_right, (right - x) / dx,
+            np.where(moves_left, (left - x) / dx, np.inf))
+        entry_y = np.where(moves_down, (top - y) / dy,
+            np.where(moves_up, (bottom - y) / dy, -np.inf))
+        exit_y = np.where(moves_down, (bottom - y) / dy,
+            np.where(moves_up, (top - y) / dy, np.inf))
+
+    # Points that don't move along an axis have to be inside the slab
+    inside_x = moves_right | moves_left | ((left <= x) & (x <= right))
+    inside_y = moves_down | moves_up | ((top <= y) & (y <= bottom))
+
+    entry = np.maximum(entry_x, entry_y)
+    hit = inside_x & inside_y\
+        & (entry <= np.minimum(exit_x, exit_y))\
+        & (0 <= entry) & (entry <= 1)
+
+    normal_x = np.where(entry_x >= entry_y, np.where(moves_right, -1, 1), 0)
+    normal_y = np.where(entry_y >= entry_x, np.where(moves_down, -1, 1), 0)
+
+    return np.where(hit, entry, np.inf), normal_x, normal_y
+
+
+class VectorEngine:
+    '''Many independent games simulated in lockstep. Balls, platforms
+    and blocks of all games are kept in NumPy arrays and every tick is
+    computed for the whole batch at once. The rules are the ones of
+    GameEngine.check_collision, so a game gives the same results as the
+    scalar engine, but it ends when its level is cleared.
+
+    Attributes
+    ----------
+        engine : object
+            GameEngine object whose rules, sizes and levels are used
+        games : int
+            Number of games
+    '''
+
+    def __init__(self, engine, games):
+        if engine.power_ups:
+            raise ValueError('power-ups can\'t be simulated in lockstep')
+
+        self.engine = engine
+        self.games = games
+        self.speed = engine.ball_speed / engine.tick_rate
+
+        self.x = np.zeros(games)
+        self.y = np.zeros(games)
+        self.x_direction = np.ones(games)
+        self.y_direction = -np.ones(games)
+        self.platform_x = np.zeros(games)
+        self.ball_shot = np.zeros(games, dtype=bool)
+        self.lives = np.full(games, engine.state.lives)
+        self.score = np.zeros(games, dtype=np.int64)
+        self.ticks = np.zeros(games, dtype=np.int64)
+        self.blocks_left = np.zeros(games, dtype=np.int64)
+
+        self.set_board(engine.rows, engine.columns)
+        self.reset_objects(np.ones(games, dtype=bool))
+
+    def set_board(self, rows, columns):
+        '''Sizes blocks of every game like GameEngine.set_board.
+
+        Parameters
+        ----------
+            rows : int
+                Number of grid rows
+            columns : int
+                Number of grid columns
+        '''
+
+        engine = self.engine
+        engine.set_board(rows, columns)
+
+        # Block cells that can be crossed by the ball in one tick
+        self.window_rows = math.floor(
+            (self.speed + engine.ball_height) / engine.block_height
+        ) + 2
+        self.window_columns = math.floor(
+            (self.speed + engine.ball_width) / engine.block_width
+        ) + 2
+
+        self.blocks = np.zeros((self.games, rows, columns), dtype=bool)
+
+    def reset_objects(self, games):
+        '''Puts the platforms at the beginning and the balls on top of
+        them.
+
+        Parameters
+        ----------
+            games : array
+                Mask of games to reset
+        '''
+
+        self.ball_shot[games] = False
+        self.platform_x[games] = self.engine.platform_start[0]
+        self.place_balls(games)
+
+    def place_balls(self, games):
+        '''Puts the balls in the center of the platforms.
+
+        Parameters
+        ----------
+            games : array
+                Mask of games
+        '''
+
+        engine = self.engine
+        platform_y = engine.platform_start[1]
+
+        self.x[games] = self.platform_x[games]
+        self.y[games] = platform_y - engine.platform_height/2\
+            - engine.ball_height/2
+        self.x_direction[games] = 1
+        self.y_direction[games] = -1
+
+    def load_level(self, level=1):
+        '''Puts blocks of a level into every game.
+
+        Parameters
+        ----------
+            level : int
+                Number of a level
+        '''
+
+        level_blocks = self.engine.levels.level(level)
+        rows, columns = level_blocks.rows, level_blocks.columns
+        self.set_board(rows, columns)
+
+        # Bit "row*columns + column" of the mask is the cell
+        size = rows * columns
+        data = level_blocks.mask.to_bytes((size + 7) // 8, 'little')
+        matrix = np.unpackbits(
+            np.frombuffer(data, dtype=np.uint8), bitorder='little'
+        )[:size].reshape(rows, columns).astype(bool)
+
+        self.blocks[:] = matrix
+        self.blocks_left[:] = len(level_blocks)
+
+    def move_platforms(self, x):
+        '''Moves the platforms to new x coordinates. The balls follow
+        the platforms until they are shot.
+
+        Parameters
+        ----------
+            x : array
+                X coordinates of platforms\' centers
+        '''
+
+        engine = self.engine
+        half_width = engine.platform_width/2
+
+        # Stops platforms at the edges
+        x = np.asarray(x, dtype=float)
+        x = np.where(x < half_width, half_width, x)
+        x = np.where(engine.width - half_width < x, engine.width - half_width, x)
+
+        self.platform_x[:] = x
+        self.place_balls(~self.ball_shot)
+
+    def launch(self, games=None):
+        '''Shoots the balls from the platforms.
+
+        Parameters
+        ----------
+            games : array
+                Mask of games, all games if omitted
+        '''
+
+        if games is None:
+            self.ball_shot[:] = True
+        else:
+            self.ball_shot[games] = True
+
+    def step(self, n=1):
+        '''Advances all games by n ticks.
+
+        Parameters
+        ----------
+            n : int
+                Number of ticks
+
+        Returns
+        -------
+            results : array
+                The most important result of every game: OK, HIT,
+                LOST_LIFE, GAME_OVER or CLEARED
+        '''
+
+        results = np.zeros(self.games, dtype=np.int8)
+        for _ in range(n):
+            np.maximum(results, self.tick(), out=results)
+
+        return results
+
+    def tick(self):
+        '''Advances all games by one tick.
+
+        Returns
+        -------
+            results : array
+                Result of every game
+        '''
+
+        engine = self.engine
+        results = np.zeros(self.games, dtype=np.int8)
+
+        # Balls wait on the platforms until they are shot
+        active = self.ball_shot & (self.lives > 0)
+        self.ticks[active] += 1
+
+        self.check_platform_collision(active)
+
+        fallen = np.zeros(self.games, dtype=bool)
+        time_left = np.ones(self.games)
+        moving = active.copy()
+
+        for _ in range(engine.max_impacts):
+            games = np.flatnonzero(moving)
+            if not games.size:
+                break
+
+            speed_x = self.speed * self.x_direction[games]
+            speed_y = self.speed * self.y_direction[games]
+            left = time_left[games]
+
+            times, kinds, normal_x, normal_y, rows, columns = \
+                self.find_impacts(games, speed_x * left, speed_y * left)
+
+            # Balls that hit nothing move through the rest of the tick
+            free = np.isinf(times)
+            free_games = games[free]
+            self.x[free_games] += speed_x[free] * left[free]
+            self.y[free_games] += speed_y[free] * left[free]
+            moving[free_games] = False
+
+            hit = ~free
+            games = games[hit]
+            times = times[hit]
+            kinds = kinds[hit]
+            left = left[hit]
+
+            self.x[games] += speed_x[hit] * (left * times)
+            self.y[games] += speed_y[hit] * (left * times)
+            time_left[games] = left - left * times
+
+            # Balls that reach the bottom edge are lost
+            floor = kinds == 'F'
+            fallen[games[floor]] = True
+            moving[games[floor]] = False
+
+            # Bounces off the hit sides
+            bounce = ~floor
+            games = games[bounce]
+            kinds = kinds[bounce]
+            normal_x = normal_x[hit][bounce]
+            normal_y = normal_y[hit][bounce]
+            self.x_direction[games] = np.where(
+                normal_x != 0, normal_x, self.x_direction[games]
+            )
+            self.y_direction[games] = np.where(
+                normal_y != 0, normal_y, self.y_direction[games]
+            )
+
+            # Deletes hit blocks
+            block = kinds == 'B'
+            block_games = games[block]
+            self.blocks[
+                block_games, rows[hit][bounce][block],
+                columns[hit][bounce][block]
+            ] = False
+            self.blocks_left[block_games] -= 1
+            self.score[block_games] += 100
+            results[block_games] = HIT
+
+            cleared = block_games[self.blocks_left[block_games] == 0]
+            results[cleared] = CLEARED
+            self.ball_shot[cleared] = False
+            moving[cleared] = False
+
+        # Reduces one life
+        self.lives[fallen] -= 1
+        over = fallen & (self.lives == 0)
+        results[over] = GAME_OVER
+
+        lost = fallen & ~over
+        results[lost] = LOST_LIFE
+        self.reset_objects(lost)
+
+        return results
+
+    def check_platform_collision(self, games):
+        '''Checks balls\' collision with the platforms.
+
+        Parameters
+        ----------
+            games : array
+                Mask of games
+        '''
+
+        engine = self.engine
+        platform_y = engine.platform_start[1]
+
+        # Balls' edges
+        ball_bottom = self.y + engine.ball_height/2
+
+        # Platforms' edges
+        platform_left = self.platform_x - engine.platform_width/2
+        platform_top = platform_y - engine.platform_height/2
+        platform_right = self.platform_x + engine.platform_width/2
+        platform_bottom = platform_y + engine.platform_height/2
+
+        # Hits platforms' top
+        hit = games\
+            & (platform_left <= self.x)\
+            & (platform_top <= ball_bottom)\
+            & (self.x <= platform_right)\
+            & (ball_bottom <= platform_bottom)
+        self.y_direction[hit] = -1
+        self.y[hit] = platform_top - engine.ball_height/2
+
+    def find_impacts(self, games, dx, dy):
+        '''Finds the first obstacle on balls\' way like
+        GameEngine.find_impact.
+
+        Parameters
+        ----------
+            games : array
+                Indices of games
+            dx : array
+                Balls\' movements along the x axis
+            dy : array
+                Balls\' movements along the y axis
+
+        Returns
+        -------
+            impacts : tuple
+                Arrays of times of impact, which are infinite where
+                nothing is hit, types of the obstacles ("W" - wall,
+                "F" - floor, "P" - platform, "B" - block), x,y of the hit
+                sides\' normals and row,column of the hit blocks
+        '''
+
+        engine = self.engine
+        x = self.x[games]
+        y = self.y[games]
+        half_width = engine.ball_width/2
+        half_height = engine.ball_height/2
+
+        window = self.window_rows * self.window_columns
+        count = 5 + window
+        times = np.full((games.size, count), np.inf)
+        normals_x = np.zeros((games.size, count), dtype=np.int8)
+        normals_y = np.zeros((games.size, count), dtype=np.int8)
+        rows = np.zeros((games.size, count), dtype=np.int64)
+        columns = np.zeros((games.size, count), dtype=np.int64)
+        kinds = np.array(['W', 'W', 'W', 'F', 'P'] + ['B'] * window)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Balls reach left edge of the canvas
+            reach = (dx < 0) & (x + dx < half_width)
+            times[:, 0] = np.where(
+                reach, np.maximum((half_width - x) / dx, 0), np.inf
+            )
+            normals_x[:, 0] = 1
+
+            # Balls reach right edge of the canvas
+            reach = (dx > 0) & (engine.width - half_width < x + dx)
+            times[:, 1] = np.where(
+                reach,
+                np.maximum((engine.width - half_width - x) / dx, 0),
+                np.inf
+            )
+            normals_x[:, 1] = -1
+
+            # Balls reach upper edge of the canvas
+            reach = (dy < 0) & (y + dy < half_height)
+            times[:, 2] = np.where(
+                reach, np.maximum((half_height - y) / dy, 0), np.inf
+            )
+            normals_y[:, 2] = 1
+
+            # Balls reach bottom edge of the canvas
+            reach = (dy > 0) & (engine.height - half_height < y + dy)
+            times[:, 3] = np.where(
+                reach,
+                np.maximum((engine.height - half_height - y) / dy, 0),
+                np.inf
+            )
+
+        # Balls reach platforms' top
+        platform_x = self.platform_x[games]
+        platform_y = engine.platform_start[1]
+        time, _, normal_y = sweep_boxes(
+            x, y, dx, dy,
+            platform_x - engine.platform_width/2,
+            platform_y - engine.platform_height/2 - half_height,
+            platform_x + engine.platform_width/2,
+            platform_y + engine.platform_height/2 - half_height
+        )
+        times[:, 4] = np.where(normal_y == -1, time, np.inf)
+        normals_y[:, 4] = -1
+
+        # Cells along balls' way, like in BlockField.query
+        start_x, start_y = engine.blocks_start
+        grid_left = start_x - engine.block_width/2
+        grid_top = start_y - engine.block_height/2
+
+        first_column = np.maximum(np.ceil(
+            (np.minimum(x, x+dx) - half_width - grid_left)
+            / engine.block_width
+        ) - 1, 0).astype(np.int64)
+        last_column = np.minimum(np.floor(
+            (np.maximum(x, x+dx) + half_width - grid_left)
+            / engine.block_width
+        ), engine.columns-1).astype(np.int64)
+        first_row = np.maximum(np.ceil(
+            (np.minimum(y, y+dy) - half_height - grid_top)
+            / engine.block_height
+        ) - 1, 0).astype(np.int64)
+        last_row = np.minimum(np.floor(
+            (np.maximum(y, y+dy) + half_height - grid_top)
+            / engine.block_height
+        ), engine.rows-1).astype(np.int64)
+
+        # Blocks' edges expanded by ball's size
+        block_half_width = (engine.block_width + engine.ball_width)/2
+        block_half_height = (engine.block_height + engine.ball_height)/2
+
+        # Cells are visited starting from the last one
+        index = 5
+        for i in range(self.window_rows):
+            row = last_row - i
+            for j in range(self.window_columns):
+                column = last_column - j
+
+                inside = (first_row <= row) & (first_column <= column)
+                exists = inside & self.blocks[
+                    games,
+                    np.clip(row, 0, engine.rows-1),
+                    np.clip(column, 0, engine.columns-1)
+                ]
+
+                block_x = start_x + column*engine.block_width
+                block_y = start_y + row*engine.block_height
+                time, normal_x, normal_y = sweep_boxes(
+                    x, y, dx, dy,
+                    block_x - block_half_width,
+                    block_y - block_half_height,
+                    block_x + block_half_width,
+                    block_y + block_half_height
+                )
+
+                times[:, index] = np.where(exists, time, np.inf)
+                normals_x[:, index] = normal_x
+                normals_y[:, index] = normal_y
+                rows[:, index] = row
+                columns[:, index] = column
+                index += 1
+
+        # The earliest impact wins, ties go to the first found one
+        first = np.argmin(times, axis=1)
+        picked = np.arange(games.size)
+
+        return (
+            times[picked, first],
+            kinds[first],
+            normals_x[picked, first],
+            normals_y[picked, first],
+            rows[picked, first],
+            columns[picked, first]
+        )